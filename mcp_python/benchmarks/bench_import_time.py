@@ -0,0 +1,87 @@
+"""Benchmark the cold-start import time of the MCP server.
+
+Runs `python -X importtime -c "import server"` in fresh interpreters, reports the median
+total import time and the slowest modules, and exits with status 1 if the median exceeds
+the budget or a lazily imported library was imported at startup.
+
+Usage:
+    python mcp_python/benchmarks/bench_import_time.py --budget-ms 1000
+"""
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent.parent / "src"
+LAZY_MODULES = ("libraries.filesystem", "libraries.jobs")  # must not be imported before the first tool call
+
+
+def measure(module: str = "server") -> dict[str, tuple[int, int]]:
+    """Import a module in a fresh interpreter and collect the import times.
+
+    Args:
+        module (str): The module to import. Defaults to "server".
+
+    Returns:
+        import_times (dict[str, tuple[int, int]]): The self and cumulative import time in microseconds by module name.
+
+    Raises:
+        RuntimeError: If the import fails.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    import_times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        import_times[name.strip()] = (int(self_us), int(cumulative_us))
+    return import_times
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Returns:
+        status (int): 0 if the import time is within the budget and no lazy module was imported, else 1.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="maximum median import time in milliseconds")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to report")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    totals_ms = [run["server"][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f"import server: median {median_ms:.1f} ms, min {min(totals_ms):.1f} ms, max {max(totals_ms):.1f} ms over {args.runs} runs")
+    print(f"slowest modules by self time (last run, top {args.top}):")
+    for name, (self_us, cumulative_us) in sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[: args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    status = 0
+    eager = [name for name in LAZY_MODULES if name in runs[-1]]
+    if eager:
+        print(f"FAIL: imported at startup, expected on first tool call: {', '.join(eager)}")
+        status = 1
+    if median_ms > args.budget_ms:
+        print(f"FAIL: median import time {median_ms:.1f} ms exceeds the budget of {args.budget_ms:.1f} ms")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
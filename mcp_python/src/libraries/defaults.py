@@ -0,0 +1,9 @@
+"""Default values shared by the libraries and the tool signatures.
+
+Kept free of imports, so tools can be registered without importing the libraries implementing them.
+"""
+
+DEFAULT_CHUNK_SIZE = 64 * 1024  # bytes returned per load_file_chunk call
+BINARY_CHUNK_SIZE = 512 * 1024  # bytes returned per load_binary_chunk call
+FILE_IO_MAX_WORKERS = 8  # threads running blocking file I/O for AsyncFileSystem
+PROMETHEUS_FILE_ENV = "MCP_PROMETHEUS_FILE"  # environment variable naming the file server_stats writes Prometheus metrics to
@@ -1,7 +1,466 @@
 """File system."""
 
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import fnmatch
+import functools
+import gzip
 import logging
+import mmap
+import os
 import pathlib
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from stat import S_ISREG
+from typing import Any
+
+from libraries.defaults import BINARY_CHUNK_SIZE, DEFAULT_CHUNK_SIZE, FILE_IO_MAX_WORKERS
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+LINE_INDEX_CACHE_SIZE = 32  # number of files whose newline offsets are kept
+CONTENT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # byte budget of the content cache
+FILE_INDEX_REFRESH_INTERVAL = 1.0  # minimum seconds between two refreshes of a file index
+SEARCH_MAX_WORKERS = 8  # threads scanning files in search_files
+SEARCH_BINARY_SNIFF_SIZE = 8192  # leading bytes checked for NUL to detect binary files
+SEARCH_MAX_LINE_LENGTH = 500  # characters of a matching line returned by search_files
+
+_line_index_cache: OrderedDict[str, tuple[tuple[int, int], array]] = OrderedDict()
+_line_index_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _mapped(filepath: pathlib.Path) -> Iterator[mmap.mmap | bytes]:
+    """Map a file read-only into memory.
+
+    Args:
+        filepath (pathlib.Path): The file to map.
+
+    Yields:
+        buffer (mmap.mmap | bytes): The mapped file, or empty bytes for an empty file.
+    """
+    with open(filepath, mode="rb") as fp:
+        # mmap cannot map a zero-length file
+        if os.fstat(fp.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _utf8_complete_length(data: bytes) -> int:
+    """Get the length of the longest prefix of data that does not end inside a UTF-8 character.
+
+    Args:
+        data (bytes): UTF-8 encoded bytes, possibly cut at an arbitrary position.
+
+    Returns:
+        length (int): The number of leading bytes that can be decoded on their own.
+    """
+    # walk back over at most 3 continuation bytes to the lead byte of the last character
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0b11000000 == 0b10000000:
+            continue
+        if byte & 0b10000000 == 0:
+            needed = 1
+        elif byte & 0b11100000 == 0b11000000:
+            needed = 2
+        elif byte & 0b11110000 == 0b11100000:
+            needed = 3
+        else:
+            needed = 4
+        return len(data) if back >= needed else len(data) - back
+    return len(data)
+
+
+class ContentCache:
+    """Process-wide LRU cache of decoded file contents.
+
+    Entries are keyed on the resolved path and validated against the file's modification time
+    and size on every lookup, so edited files are reloaded on the next read. The least recently
+    used entries are evicted once the cached file sizes exceed the byte budget.
+
+    Attributes:
+        max_bytes (int): The byte budget of the cache.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that read the file from disk.
+        evictions (int): Number of entries evicted to stay within the byte budget.
+    """
+
+    def __init__(self, max_bytes: int = CONTENT_CACHE_MAX_BYTES) -> None:
+        """Initialize ContentCache.
+
+        Args:
+            max_bytes (int): The byte budget of the cache. Defaults to 64 MiB.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[tuple[int, int], str]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str | pathlib.Path) -> str:
+        """Get the content of a text file, reading it from disk if the cached copy is missing or stale.
+
+        Args:
+            filepath (str | pathlib.Path): The UTF-8 text file.
+
+        Returns:
+            content (str): The file content.
+        """
+        filepath = pathlib.Path(filepath).resolve()
+        key = str(filepath)
+        stat = filepath.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        with open(filepath, mode="r", encoding="utf-8") as fp:
+            stat = os.fstat(fp.fileno())
+            signature = (stat.st_mtime_ns, stat.st_size)
+            content = fp.read()
+            stat = os.fstat(fp.fileno())
+
+        # do not cache a file that changed while it was being read
+        if (stat.st_mtime_ns, stat.st_size) == signature and signature[1] <= self.max_bytes:
+            self._put(key, signature, content)
+        return content
+
+    def _put(self, key: str, signature: tuple[int, int], content: str) -> None:
+        """Insert an entry and evict the least recently used entries over the byte budget."""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._size -= previous[0][1]
+            self._entries[key] = (signature, content)
+            self._size += signature[1]
+            while self._size > self.max_bytes:
+                _, (evicted_signature, _) = self._entries.popitem(last=False)
+                self._size -= evicted_signature[1]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Get the cache statistics.
+
+        Returns:
+            stats (dict): The hit, miss and eviction counters, number of entries, cached bytes and byte budget.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+content_cache = ContentCache()
+
+
+class FileIndex:
+    """In-memory index of the files under a directory tree.
+
+    The tree is walked once with os.scandir. Later refreshes only stat the directories and rescan
+    those whose modification time changed, which happens when entries are added, removed or
+    renamed. A file changed in place does not change its directory, so its size and modification
+    time are only updated by restat, which list_files calls for the files it returns, or when its
+    directory is rescanned. Symbolic links to directories are not followed.
+
+    Attributes:
+        root (pathlib.Path): The resolved root directory.
+        refresh_interval (float): Minimum seconds between two refreshes.
+    """
+
+    def __init__(self, root: str | pathlib.Path, refresh_interval: float = FILE_INDEX_REFRESH_INTERVAL) -> None:
+        """Initialize FileIndex.
+
+        Args:
+            root (str | pathlib.Path): The root directory to index.
+            refresh_interval (float): Minimum seconds between two refreshes. Defaults to 1.0.
+        """
+        self.root = pathlib.Path(root).resolve()
+        self.refresh_interval = refresh_interval
+        # relative directory -> (directory mtime, {file name: (size, mtime)}, subdirectory names)
+        self._dirs: dict[str, tuple[int, dict[str, tuple[int, int]], list[str]]] = {}
+        self._entries: list[tuple[str, int, int]] | None = None
+        self._refreshed_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _scan(self, reldir: str) -> tuple[dict[str, tuple[int, int]], list[str]]:
+        """Scan one directory for its files and subdirectories."""
+        files = {}
+        subdirs = []
+        with os.scandir(self.root / reldir) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return files, subdirs
+
+    def refresh(self, force: bool = False) -> None:
+        """Bring the index up to date with the directory tree.
+
+        Args:
+            force (bool): Refresh even if the last refresh is more recent than the refresh interval. Defaults to False.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+
+            dirs = {}
+            changed = False
+            pending = [""]
+            while pending:
+                reldir = pending.pop()
+                try:
+                    mtime = os.stat(self.root / reldir).st_mtime_ns
+                except OSError:
+                    changed = True
+                    continue
+                cached = self._dirs.get(reldir)
+                if cached and cached[0] == mtime:
+                    files, subdirs = cached[1], cached[2]
+                else:
+                    try:
+                        files, subdirs = self._scan(reldir)
+                    except OSError:
+                        continue
+                    changed = True
+                dirs[reldir] = (mtime, files, subdirs)
+                pending.extend(f"{reldir}/{name}" if reldir else name for name in subdirs)
+
+            if changed or dirs.keys() != self._dirs.keys():
+                self._dirs = dirs
+                self._entries = None
+            self._refreshed_at = now
+
+    def restat(self, paths: list[str]) -> list[tuple[str, int, int]]:
+        """Stat indexed files again and update their size and modification time in the index.
+
+        Args:
+            paths (list[str]): The relative POSIX paths of the files.
+
+        Returns:
+            entries (list[tuple[str, int, int]]): The path, current size and modification time in nanoseconds of each file that still exists, in the order of paths.
+        """
+        entries = []
+        current: dict[str, tuple[int, int] | None] = {}
+        for path in paths:
+            try:
+                stat = os.stat(self.root / path)
+            except OSError:
+                current[path] = None
+                continue
+            if not S_ISREG(stat.st_mode):
+                current[path] = None
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+
+        with self._lock:
+            for path, info in current.items():
+                reldir, _, name = path.rpartition("/")
+                cached = self._dirs.get(reldir)
+                if cached is None or cached[1].get(name) == info:
+                    continue
+                if info is None:
+                    cached[1].pop(name, None)
+                else:
+                    cached[1][name] = info
+                self._entries = None
+        return entries
+
+    def entries(self) -> list[tuple[str, int, int]]:
+        """Get all indexed files, refreshing the index if needed.
+
+        Returns:
+            entries (list[tuple[str, int, int]]): The relative POSIX path, size and modification time in nanoseconds of each file, sorted by path.
+        """
+        self.refresh()
+        with self._lock:
+            if self._entries is None:
+                self._entries = sorted((f"{reldir}/{name}" if reldir else name, size, mtime) for reldir, (_, files, _) in self._dirs.items() for name, (size, mtime) in files.items())
+            return self._entries
+
+
+_file_indexes: dict[str, FileIndex] = {}
+_file_indexes_lock = threading.Lock()
+
+
+def get_file_index(root: str | pathlib.Path) -> FileIndex:
+    """Get the process-wide file index of a directory tree.
+
+    Args:
+        root (str | pathlib.Path): The root directory.
+
+    Returns:
+        index (FileIndex): The shared file index of the root directory.
+    """
+    key = str(pathlib.Path(root).resolve())
+    with _file_indexes_lock:
+        if key not in _file_indexes:
+            _file_indexes[key] = FileIndex(key)
+        return _file_indexes[key]
+
+
+def _search_file(filepath: pathlib.Path, regex: re.Pattern[bytes], max_matches: int) -> list[tuple[int, str]]:
+    """Search a file for lines matching a regular expression.
+
+    Args:
+        filepath (pathlib.Path): The file to search.
+        regex (re.Pattern[bytes]): The compiled pattern.
+        max_matches (int): Stop after this many matching lines.
+
+    Returns:
+        matches (list[tuple[int, str]]): The line number and text of each matching line, empty for binary files.
+    """
+    matches = []
+    with _mapped(filepath) as buffer:
+        if b"\0" in buffer[:SEARCH_BINARY_SNIFF_SIZE]:
+            return matches
+        size = len(buffer)
+        line_no = 1
+        counted = 0  # offset up to which newlines are counted in line_no
+        pos = 0
+        while len(matches) < max_matches and pos <= size:
+            match = regex.search(buffer, pos)
+            # an empty match after the last newline is past the last line, as is any match in an empty file
+            if not match or (match.start() == size and (size == 0 or buffer[size - 1] == ord("\n"))):
+                break
+            line_start = buffer.rfind(b"\n", 0, match.start()) + 1
+            line_end = buffer.find(b"\n", match.end())
+            if line_end == -1:
+                line_end = size
+            line_no += buffer[counted:line_start].count(b"\n")
+            counted = line_start
+            text = buffer[line_start:line_end].decode("utf-8", errors="replace").rstrip("\r")
+            matches.append((line_no, text[:SEARCH_MAX_LINE_LENGTH]))
+            # report each line once
+            pos = line_end + 1
+    return matches
+
+
+class MappedReader:
+    """Read byte ranges and line ranges of a file through mmap.
+
+    The start offset of every line is indexed on the first line read and reused by later reads
+    until the file's modification time or size changes.
+
+    Attributes:
+        filepath (pathlib.Path): The resolved file path.
+    """
+
+    def __init__(self, filepath: str | pathlib.Path) -> None:
+        """Initialize MappedReader.
+
+        Args:
+            filepath (str | pathlib.Path): The file to read.
+        """
+        self.filepath = pathlib.Path(filepath).resolve()
+
+    def signature(self) -> tuple[int, int]:
+        """Get the file signature used to validate cached data.
+
+        Returns:
+            signature (tuple[int, int]): The modification time in nanoseconds and the size of the file.
+        """
+        stat = self.filepath.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """Read a byte range of the file.
+
+        Args:
+            start (int): The first byte offset, inclusive.
+            end (int): The last byte offset, exclusive.
+
+        Returns:
+            data (bytes): The bytes in the range, clamped to the file size.
+        """
+        with _mapped(self.filepath) as buffer:
+            return buffer[start:end]
+
+    def line_offsets(self) -> array:
+        """Get the start offset of every line, building the index on first use.
+
+        Returns:
+            offsets (array): The byte offset at which each line starts.
+        """
+        key = str(self.filepath)
+        signature = self.signature()
+        with _line_index_lock:
+            cached = _line_index_cache.get(key)
+            if cached and cached[0] == signature:
+                _line_index_cache.move_to_end(key)
+                return cached[1]
+
+        with _mapped(self.filepath) as buffer:
+            offsets = array("Q", [0])
+            offsets.extend(match.end() for match in re.finditer(b"\n", buffer))
+            # a trailing newline does not start another line
+            if len(offsets) > 1 and offsets[-1] == len(buffer):
+                offsets.pop()
+            if len(buffer) == 0:
+                offsets.pop()
+
+        with _line_index_lock:
+            _line_index_cache[key] = (signature, offsets)
+            _line_index_cache.move_to_end(key)
+            while len(_line_index_cache) > LINE_INDEX_CACHE_SIZE:
+                _line_index_cache.popitem(last=False)
+        return offsets
+
+    def read_lines(self, first: int, last: int) -> tuple[bytes, int]:
+        """Read a range of lines of the file.
+
+        Args:
+            first (int): The first line number, 1-based and inclusive.
+            last (int): The last line number, inclusive.
+
+        Returns:
+            data (bytes): The bytes of the lines, clamped to the number of lines.
+            total_lines (int): The number of lines in the file.
+        """
+        offsets = self.line_offsets()
+        total_lines = len(offsets)
+        if first > total_lines or last < first:
+            return b"", total_lines
+        start = offsets[first - 1]
+        end = offsets[last] if last < total_lines else None
+        with _mapped(self.filepath) as buffer:
+            return buffer[start:end], total_lines
 
 
 class FileSystem:
@@ -13,9 +472,53 @@ class FileSystem:
 
     def show_file_list(self) -> list[str] | bool:
         """Show file list."""
+        # only the top-level files, scanned directly so they are always current without walking the tree for the index
         try:
-            files_list = [str(f) for f in self.basedir.glob("*") if f.is_file()]
-            return files_list
+            with os.scandir(self.basedir) as it:
+                return sorted(entry.path for entry in it if entry.is_file())
+        except Exception as e:
+            logging.error(f"Error with show file list: {e}")
+            return False
+
+    def list_files(
+        self,
+        pattern: str = "*",
+        recursive: bool = True,
+        extensions: list[str] | None = None,
+        offset: int = 0,
+        limit: int | None = 1000,
+    ) -> dict | bool:
+        """List files under the base directory from the shared file index.
+
+        The files of the returned page are stat-ed again, so their size and modification time are
+        current even if they changed in place since the index scanned their directory.
+
+        Args:
+            pattern (str): Glob pattern matched against the path relative to the base directory. Defaults to "*".
+            recursive (bool): Include files in subdirectories. Defaults to True.
+            extensions (list[str] | None): Only include files with one of these suffixes, such as [".py", ".md"]. Defaults to None.
+            offset (int): Number of matching files to skip. Defaults to 0.
+            limit (int | None): Maximum number of files to return, None for all. Defaults to 1000.
+
+        Returns:
+            files (dict | bool): The page of files with keys `files`, `total`, `offset` and `next_offset`, or False on error.
+        """
+        try:
+            suffixes = tuple(ext.lower() for ext in extensions) if extensions else None
+            matches = [
+                (path, size, mtime)
+                for path, size, mtime in get_file_index(self.basedir).entries()
+                if (recursive or "/" not in path) and (suffixes is None or path.lower().endswith(suffixes)) and fnmatch.fnmatch(path, pattern)
+            ]
+            end = len(matches) if limit is None else offset + limit
+            selected = matches[offset:end]
+            page = get_file_index(self.basedir).restat([path for path, _, _ in selected])
+            return {
+                "files": [{"path": path, "size": size, "mtime_ns": mtime} for path, size, mtime in page],
+                "total": len(matches),
+                "offset": offset,
+                "next_offset": offset + len(selected) if offset + len(selected) < len(matches) else None,
+            }
         except Exception as e:
             logging.error(f"Error with list files: {e}")
             return False
@@ -40,16 +543,325 @@ class FileSystem:
                 logging.error(f"Error with load file content: file not found {filepath}")
                 return False
 
-            with open(filepath, mode="r", encoding="utf-8") as fp:
-                contents = ""
-                while True:
-                    content = fp.read(4096)
-                    if content:
-                        contents += content
-                    else:
+            return content_cache.get(filepath)
+        except Exception as e:
+            logging.error(f"Error with load file content: {e}")
+            return False
+
+    def load_file_chunk(self, filename: str, offset: int = 0, length: int = DEFAULT_CHUNK_SIZE) -> dict | bool:
+        """Load a chunk of file content.
+
+        Only the requested byte range is copied out of the memory-mapped file, so large files
+        can be walked page by page with bounded memory. The chunk is cut at a UTF-8 character
+        boundary, pass `next_offset` back as `offset` to read the following chunk.
+
+        Args:
+            filename (str): The file to read.
+            offset (int): Byte offset to start reading from. Defaults to 0.
+            length (int): Maximum number of bytes to read. Defaults to 65536.
+
+        Returns:
+            chunk (dict | bool): The chunk with keys `content`, `offset`, `next_offset`, `size` and `eof`, or False on error.
+        """
+        try:
+            logging.info(f"{filename} {offset=} {length=}")
+            filepath = pathlib.Path(filename)
+
+            if not filepath.is_file():
+                logging.error(f"Error with load file chunk: file not found {filepath}")
+                return False
+            if offset < 0 or length <= 0:
+                logging.error(f"Error with load file chunk: invalid range {offset=} {length=}")
+                return False
+
+            # a chunk must be able to hold the longest UTF-8 character
+            length = max(length, 4)
+
+            with _mapped(filepath) as buffer:
+                size = len(buffer)
+                # skip continuation bytes if offset points inside a character
+                while offset < size and buffer[offset] & 0b11000000 == 0b10000000:
+                    offset += 1
+                data = buffer[offset : offset + length]
+
+            if offset + len(data) < size:
+                data = data[: _utf8_complete_length(data)]
+            next_offset = offset + len(data)
+
+            return {
+                "content": data.decode("utf-8"),
+                "offset": offset,
+                "next_offset": next_offset,
+                "size": size,
+                "eof": next_offset >= size,
+            }
+        except Exception as e:
+            logging.error(f"Error with load file chunk: {e}")
+            return False
+
+    def load_binary_chunk(
+        self,
+        filename: str,
+        offset: int = 0,
+        length: int = BINARY_CHUNK_SIZE,
+        compression: str | None = None,
+    ) -> dict | bool:
+        """Load a chunk of a binary file as base64.
+
+        The chunk is taken as a memoryview slice of the memory-mapped file and encoded or
+        compressed from there, so only the encoded output is copied.
+
+        Args:
+            filename (str): The file to read.
+            offset (int): Byte offset to start reading from. Defaults to 0.
+            length (int): Maximum number of bytes to read. Defaults to 524288.
+            compression (str | None): Compress the chunk with "gzip" or "zstd" before encoding. Defaults to None.
+
+        Returns:
+            chunk (dict | bool): The chunk with keys `data`, `compression`, `offset`, `next_offset`, `size` and `eof`, or False on error.
+        """
+        try:
+            logging.info(f"{filename} {offset=} {length=} {compression=}")
+            filepath = pathlib.Path(filename)
+
+            if not filepath.is_file():
+                logging.error(f"Error with load binary chunk: file not found {filepath}")
+                return False
+            if offset < 0 or length <= 0:
+                logging.error(f"Error with load binary chunk: invalid range {offset=} {length=}")
+                return False
+            if compression not in (None, "gzip", "zstd"):
+                logging.error(f"Error with load binary chunk: unsupported compression {compression}")
+                return False
+            if compression == "zstd" and zstandard is None:
+                logging.error("Error with load binary chunk: zstd compression needs the zstandard package")
+                return False
+
+            with _mapped(filepath) as buffer, memoryview(buffer) as view, view[offset : offset + length] as piece:
+                size = len(view)
+                read = len(piece)
+                if compression == "gzip":
+                    data = base64.b64encode(gzip.compress(piece))
+                elif compression == "zstd":
+                    data = base64.b64encode(zstandard.ZstdCompressor().compress(piece))
+                else:
+                    data = base64.b64encode(piece)
+
+            next_offset = min(offset, size) + read
+            return {
+                "data": data.decode("ascii"),
+                "compression": compression,
+                "offset": offset,
+                "next_offset": next_offset,
+                "size": size,
+                "eof": next_offset >= size,
+            }
+        except Exception as e:
+            logging.error(f"Error with load binary chunk: {e}")
+            return False
+
+    def read_range(self, filename: str, start: int, end: int) -> dict | bool:
+        """Read a byte range of a file.
+
+        Args:
+            filename (str): The file to read.
+            start (int): The first byte offset, inclusive.
+            end (int): The last byte offset, exclusive.
+
+        Returns:
+            content (dict | bool): The decoded range with keys `content`, `start`, `end` and `size`, or False on error.
+        """
+        try:
+            logging.info(f"{filename} {start=} {end=}")
+            filepath = pathlib.Path(filename)
+
+            if not filepath.is_file():
+                logging.error(f"Error with read range: file not found {filepath}")
+                return False
+            if start < 0 or end < start:
+                logging.error(f"Error with read range: invalid range {start=} {end=}")
+                return False
+
+            reader = MappedReader(filepath)
+            data = reader.read_range(start, end)
+            return {
+                "content": data.decode("utf-8", errors="replace"),
+                "start": start,
+                "end": start + len(data),
+                "size": reader.signature()[1],
+            }
+        except Exception as e:
+            logging.error(f"Error with read range: {e}")
+            return False
+
+    def read_lines(self, filename: str, first: int, last: int) -> dict | bool:
+        """Read a range of lines of a file.
+
+        Args:
+            filename (str): The file to read.
+            first (int): The first line number, 1-based and inclusive.
+            last (int): The last line number, inclusive.
+
+        Returns:
+            content (dict | bool): The decoded lines with keys `content`, `first`, `last` and `total_lines`, or False on error.
+        """
+        try:
+            logging.info(f"{filename} {first=} {last=}")
+            filepath = pathlib.Path(filename)
+
+            if not filepath.is_file():
+                logging.error(f"Error with read lines: file not found {filepath}")
+                return False
+            if first < 1 or last < first:
+                logging.error(f"Error with read lines: invalid range {first=} {last=}")
+                return False
+
+            data, total_lines = MappedReader(filepath).read_lines(first, last)
+            return {
+                "content": data.decode("utf-8", errors="replace"),
+                "first": first,
+                "last": min(last, total_lines),
+                "total_lines": total_lines,
+            }
+        except Exception as e:
+            logging.error(f"Error with read lines: {e}")
+            return False
+
+    def iter_search(
+        self,
+        pattern: str,
+        glob: str = "*",
+        max_results: int = 100,
+        ignore_case: bool = False,
+    ) -> Iterator[dict]:
+        """Search files under the base directory and yield matching lines as each file is scanned.
+
+        Files are scanned in parallel by a thread pool, binary files are skipped.
+
+        Args:
+            pattern (str): Regular expression matched against each line.
+            glob (str): Glob pattern matched against the path relative to the base directory. Defaults to "*".
+            max_results (int): Stop after this many matching lines. Defaults to 100.
+            ignore_case (bool): Match case-insensitively. Defaults to False.
+
+        Yields:
+            match (dict): The matching line with keys `path`, `line` and `text`.
+
+        Raises:
+            re.error: If pattern is not a valid regular expression.
+            ValueError: If max_results is negative.
+        """
+        if max_results < 0:
+            raise ValueError(f"max_results must not be negative: {max_results}")
+        regex = re.compile(pattern.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        paths = [path for path, _, _ in get_file_index(self.basedir).entries() if fnmatch.fnmatch(path, glob)]
+        remaining = max_results
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS) as executor:
+            futures = {executor.submit(_search_file, self.basedir / path, regex, max_results): path for path in paths}
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        matches = future.result()
+                    except OSError as e:
+                        logging.error(f"Error with search file {futures[future]}: {e}")
+                        continue
+                    for line_no, text in matches[:remaining]:
+                        yield {"path": futures[future], "line": line_no, "text": text}
+                    remaining -= min(len(matches), remaining)
+                    if remaining == 0:
                         break
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def search_files(
+        self,
+        pattern: str,
+        glob: str = "*",
+        max_results: int = 100,
+        ignore_case: bool = False,
+    ) -> dict | bool:
+        """Search files under the base directory for lines matching a regular expression.
+
+        Args:
+            pattern (str): Regular expression matched against each line.
+            glob (str): Glob pattern matched against the path relative to the base directory. Defaults to "*".
+            max_results (int): Maximum number of matching lines to return. Defaults to 100.
+            ignore_case (bool): Match case-insensitively. Defaults to False.
 
-            return contents
+        Returns:
+            result (dict | bool): The matches with keys `matches` and `truncated`, true if more lines match, or False on error such as a negative max_results.
+        """
+        try:
+            logging.info(f"{pattern=} {glob=} {max_results=}")
+            if max_results < 0:
+                raise ValueError(f"max_results must not be negative: {max_results}")
+            # one more match than returned tells whether the search stopped before the last match
+            matches = list(self.iter_search(pattern, glob=glob, max_results=max_results + 1, ignore_case=ignore_case))
+            return {"matches": matches[:max_results], "truncated": len(matches) > max_results}
         except Exception as e:
-            logging.error(f"Error with load file content: {e}")
+            logging.error(f"Error with search files: {e}")
             return False
+
+
+class AsyncFileSystem:
+    """Asynchronous file system.
+
+    Runs the blocking FileSystem methods on a dedicated thread pool, so concurrent callers on an
+    event loop overlap their disk waits. The pool size bounds the number of concurrent file operations.
+
+    Attributes:
+        filesystem (FileSystem): The synchronous file system.
+        max_workers (int): Maximum number of concurrent file operations.
+    """
+
+    def __init__(self, max_workers: int = FILE_IO_MAX_WORKERS) -> None:
+        """Initialize AsyncFileSystem.
+
+        Args:
+            max_workers (int): Maximum number of concurrent file operations. Defaults to 8.
+        """
+        self.filesystem = FileSystem()
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-io")
+
+    async def _call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Run a blocking function on the file I/O thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def show_file_list(self) -> list[str] | bool:
+        """Show file list."""
+        return await self._call(self.filesystem.show_file_list)
+
+    async def list_files(self, **kwargs: Any) -> dict | bool:  # noqa: ANN401
+        """List files under the base directory, see FileSystem.list_files."""
+        return await self._call(self.filesystem.list_files, **kwargs)
+
+    async def show_filepath(self, filename: str) -> str | bool:
+        """Show filepath."""
+        return await self._call(self.filesystem.show_filepath, filename)
+
+    async def load_file_content(self, filename: str) -> str | bool:
+        """Load file content."""
+        return await self._call(self.filesystem.load_file_content, filename)
+
+    async def load_file_chunk(self, filename: str, offset: int = 0, length: int = DEFAULT_CHUNK_SIZE) -> dict | bool:
+        """Load a chunk of file content, see FileSystem.load_file_chunk."""
+        return await self._call(self.filesystem.load_file_chunk, filename, offset=offset, length=length)
+
+    async def load_binary_chunk(self, filename: str, **kwargs: Any) -> dict | bool:  # noqa: ANN401
+        """Load a chunk of a binary file as base64, see FileSystem.load_binary_chunk."""
+        return await self._call(self.filesystem.load_binary_chunk, filename, **kwargs)
+
+    async def read_range(self, filename: str, start: int, end: int) -> dict | bool:
+        """Read a byte range of a file, see FileSystem.read_range."""
+        return await self._call(self.filesystem.read_range, filename, start, end)
+
+    async def read_lines(self, filename: str, first: int, last: int) -> dict | bool:
+        """Read a range of lines of a file, see FileSystem.read_lines."""
+        return await self._call(self.filesystem.read_lines, filename, first, last)
+
+    async def search_files(self, pattern: str, **kwargs: Any) -> dict | bool:  # noqa: ANN401
+        """Search files under the base directory, see FileSystem.search_files."""
+        return await self._call(self.filesystem.search_files, pattern, **kwargs)
@@ -0,0 +1,210 @@
+"""Background jobs."""
+
+import concurrent.futures
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+JOB_MAX_WORKERS = 4  # jobs running at the same time, further jobs wait in the queue
+JOB_HISTORY_SIZE = 100  # finished jobs kept for status queries
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """Background job.
+
+    The job function receives the job as its first argument. It reports progress with
+    report_progress and should return early once cancel_requested is True.
+
+    Attributes:
+        job_id (str): The job id.
+        name (str): The job name.
+        status (str): One of pending, running, completed, failed and cancelled.
+        progress (float): The progress between 0.0 and 1.0.
+        message (str): The latest progress message.
+        result (Any): The return value of the job function once completed.
+        error (str | None): The error message if the job failed.
+        created_at (float): The submission time as a Unix timestamp.
+        finished_at (float | None): The time the job finished as a Unix timestamp.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Initialize Job.
+
+        Args:
+            name (str): The job name.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.name = name
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future: concurrent.futures.Future | None = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        """Get whether cancellation of the job was requested.
+
+        Returns:
+            cancel_requested (bool): True if the job should stop.
+        """
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self) -> bool:
+        """Get whether the job finished.
+
+        Returns:
+            done (bool): True if the job completed, failed or was cancelled.
+        """
+        return self.status in (COMPLETED, FAILED, CANCELLED)
+
+    def report_progress(self, progress: float, message: str = "") -> None:
+        """Report the progress of the job.
+
+        Args:
+            progress (float): The progress between 0.0 and 1.0.
+            message (str): The progress message. Defaults to "".
+        """
+        self.progress = min(max(progress, 0.0), 1.0)
+        self.message = message
+
+    def to_dict(self) -> dict:
+        """Get the job state.
+
+        Returns:
+            state (dict): The job id, name, status, progress, message, result, error and timestamps.
+        """
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Run jobs on a bounded thread pool and track their state.
+
+    Attributes:
+        max_workers (int): Number of jobs running at the same time.
+        history_size (int): Number of finished jobs kept for status queries.
+    """
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, history_size: int = JOB_HISTORY_SIZE) -> None:
+        """Initialize JobManager.
+
+        Args:
+            max_workers (int): Number of jobs running at the same time. Defaults to 4.
+            history_size (int): Number of finished jobs kept for status queries. Defaults to 100.
+        """
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:  # noqa: ANN401
+        """Submit a job.
+
+        Args:
+            name (str): The job name.
+            fn (Callable[..., Any]): The job function, called as fn(job, *args, **kwargs).
+            *args (Any): Positional arguments of the job function.
+            **kwargs (Any): Keyword arguments of the job function.
+
+        Returns:
+            job (Job): The submitted job.
+        """
+        job = Job(name)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn, *args, **kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Run the job function and record its outcome."""
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return None
+        job.status = RUNNING
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = CANCELLED if job.cancel_requested else COMPLETED
+            return job.result
+        except Exception as e:
+            logging.error(f"Error with job {job.name} {job.job_id}: {e}")
+            job.error = str(e)
+            job.status = FAILED
+            raise
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history size."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(finished) - self.history_size, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        """Get a job.
+
+        Args:
+            job_id (str): The job id.
+
+        Returns:
+            job (Job | None): The job, or None if the job id is unknown.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job. A pending job never starts, a running job is asked to stop.
+
+        Args:
+            job_id (str): The job id.
+
+        Returns:
+            cancelled (bool): False if the job id is unknown or the job already finished.
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        return True
+
+    def list(self) -> list[dict]:
+        """List the state of all tracked jobs.
+
+        Returns:
+            jobs (list[dict]): The state of each job, oldest first.
+        """
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+
+job_manager = JobManager()
@@ -0,0 +1,225 @@
+"""Metrics."""
+
+import functools
+import inspect
+import pathlib
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+LATENCY_SAMPLE_SIZE = 1024  # most recent latencies kept per name for percentiles
+PERCENTILES = (50, 95, 99)
+
+
+def _size(value: Any) -> int:  # noqa: ANN401
+    """Estimate the payload size of an argument or return value in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, str | bytes | bytearray):
+        # json.dumps escapes non-ASCII characters, so the length of a JSON string is its size in bytes
+        return len(value)
+    if isinstance(value, list | tuple):
+        return sum(_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_size(key) + _size(item) for key, item in value.items())
+    if isinstance(value, int | float | bool):
+        return len(str(value))
+    content = getattr(value, "content", None)
+    text = getattr(content, "text", content)
+    return _size(text) if isinstance(text, str) else 0
+
+
+def _percentile(samples: list[float], percentile: int) -> float:
+    """Get a percentile of sorted samples by the nearest-rank method."""
+    if not samples:
+        return 0.0
+    rank = max(round(percentile / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+class CallStats:
+    """Statistics of the calls to one tool or prompt.
+
+    Attributes:
+        calls (int): Number of calls.
+        errors (int): Number of calls that raised an exception.
+        total_seconds (float): Total time spent in calls.
+        bytes_in (int): Total size of the arguments.
+        bytes_out (int): Total size of the return values.
+        latencies (deque[float]): The most recent call latencies in seconds.
+    """
+
+    def __init__(self, sample_size: int = LATENCY_SAMPLE_SIZE) -> None:
+        """Initialize CallStats.
+
+        Args:
+            sample_size (int): Number of recent latencies kept for percentiles. Defaults to 1024.
+        """
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latencies: deque[float] = deque(maxlen=sample_size)
+
+    def to_dict(self) -> dict:
+        """Get the statistics.
+
+        Returns:
+            stats (dict): The counters, totals and p50/p95/p99 latencies in seconds.
+        """
+        samples = sorted(self.latencies)
+        stats = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": self.total_seconds,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+        stats.update({f"p{percentile}": _percentile(samples, percentile) for percentile in PERCENTILES})
+        return stats
+
+
+class Metrics:
+    """Collect call counts, latencies, payload sizes and errors of tools and prompts.
+
+    Attributes:
+        sample_size (int): Number of recent latencies kept per name for percentiles.
+    """
+
+    def __init__(self, sample_size: int = LATENCY_SAMPLE_SIZE) -> None:
+        """Initialize Metrics.
+
+        Args:
+            sample_size (int): Number of recent latencies kept per name for percentiles. Defaults to 1024.
+        """
+        self.sample_size = sample_size
+        self._stats: dict[str, CallStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, bytes_in: int = 0, bytes_out: int = 0, error: bool = False) -> None:
+        """Record one call.
+
+        Args:
+            name (str): The tool or prompt name.
+            seconds (float): The call latency in seconds.
+            bytes_in (int): The size of the arguments. Defaults to 0.
+            bytes_out (int): The size of the return value. Defaults to 0.
+            error (bool): Whether the call raised an exception. Defaults to False.
+        """
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = CallStats(self.sample_size)
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.total_seconds += seconds
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.latencies.append(seconds)
+
+    def instrument(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Decorate a sync or async function to record its calls under the function name.
+
+        The wrapper keeps the signature of the function, so it can be registered as an MCP tool or prompt.
+
+        Args:
+            fn (Callable[..., Any]): The function to instrument.
+
+        Returns:
+            wrapper (Callable[..., Any]): The instrumented function.
+        """
+        name = fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+                start = time.perf_counter()
+                result = None
+                error = False
+                try:
+                    result = await fn(*args, **kwargs)
+                    return result
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    self.record(name, time.perf_counter() - start, _size(list(args)) + _size(kwargs), _size(result), error)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            start = time.perf_counter()
+            result = None
+            error = False
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.record(name, time.perf_counter() - start, _size(list(args)) + _size(kwargs), _size(result), error)
+
+        return wrapper
+
+    def snapshot(self) -> dict[str, dict]:
+        """Get the statistics of every recorded name.
+
+        Returns:
+            stats (dict[str, dict]): The statistics keyed by tool or prompt name.
+        """
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+
+    def to_prometheus(self, gauges: dict[str, float] | None = None) -> str:
+        """Render the statistics in the Prometheus text exposition format.
+
+        Args:
+            gauges (dict[str, float] | None): Additional gauges by metric name, such as cache counters. Defaults to None.
+
+        Returns:
+            text (str): The metrics text.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        counters = (
+            ("calls", "mcp_tool_calls_total", "Number of calls."),
+            ("errors", "mcp_tool_errors_total", "Number of calls that raised an exception."),
+            ("bytes_in", "mcp_tool_bytes_in_total", "Total size of the arguments in bytes."),
+            ("bytes_out", "mcp_tool_bytes_out_total", "Total size of the return values in bytes."),
+        )
+        for key, metric, description in counters:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{tool="{name}"}} {stats[key]}' for name, stats in snapshot.items()]
+
+        metric = "mcp_tool_latency_seconds"
+        lines += [f"# HELP {metric} Call latency in seconds.", f"# TYPE {metric} summary"]
+        for name, stats in snapshot.items():
+            lines += [f'{metric}{{tool="{name}",quantile="{percentile / 100}"}} {stats[f"p{percentile}"]}' for percentile in PERCENTILES]
+            lines += [f'{metric}_sum{{tool="{name}"}} {stats["total_seconds"]}', f'{metric}_count{{tool="{name}"}} {stats["calls"]}']
+
+        for metric, value in (gauges or {}).items():
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def dump_prometheus(self, filepath: str | pathlib.Path, gauges: dict[str, float] | None = None) -> None:
+        """Write the statistics to a file in the Prometheus text exposition format.
+
+        The file is replaced atomically, so a collector never reads a partial dump.
+
+        Args:
+            filepath (str | pathlib.Path): The output file.
+            gauges (dict[str, float] | None): Additional gauges by metric name. Defaults to None.
+        """
+        filepath = pathlib.Path(filepath)
+        tmp_filepath = filepath.with_name(f"{filepath.name}.tmp")
+        tmp_filepath.write_text(self.to_prometheus(gauges), encoding="utf-8")
+        tmp_filepath.replace(filepath)
+
+
+metrics = Metrics()
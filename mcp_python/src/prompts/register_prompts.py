@@ -3,6 +3,7 @@
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.prompts import base
 
+from libraries.metrics import metrics
 from prompts.template import template_prompts
 
 
@@ -10,6 +11,7 @@ def register_prompts(mcp: FastMCP) -> None:
     """Register prompts."""
 
     @mcp.prompt(title="Convert To Markdown")
+    @metrics.instrument
     async def convert_to_markdown(filename: str) -> list[base.Message]:
         """Convert a file such as [PDF, PPTX, DOCX] to markdown format. Need to install MCP Server MarkItDown.
 
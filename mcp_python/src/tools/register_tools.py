@@ -1,47 +1,237 @@
 """Register tools."""
 
+import asyncio
+import functools
 import json
+import os
 import time
+from typing import TYPE_CHECKING
 
 from mcp.server.fastmcp import Context, FastMCP
 
-from libraries.filesystem import FileSystem
+from libraries.defaults import BINARY_CHUNK_SIZE, DEFAULT_CHUNK_SIZE, FILE_IO_MAX_WORKERS, PROMETHEUS_FILE_ENV
+from libraries.metrics import metrics
+
+if TYPE_CHECKING:
+    from libraries.filesystem import AsyncFileSystem
+    from libraries.jobs import Job, JobManager
+
+JOB_POLL_INTERVAL = 0.1  # seconds between progress checks of a job awaited by a tool
+
+
+# The libraries implementing the tools are imported on the first tool call instead of at
+# registration, so a stdio server spawned per client session starts serving sooner.
+
+
+@functools.cache
+def get_filesystem(max_workers: int) -> "AsyncFileSystem":
+    """Get the asynchronous file system, importing libraries.filesystem on first use.
+
+    Args:
+        max_workers (int): Maximum number of concurrent file operations.
+
+    Returns:
+        filesystem (AsyncFileSystem): The asynchronous file system shared by the file tools.
+    """
+    from libraries.filesystem import AsyncFileSystem
+
+    return AsyncFileSystem(max_workers=max_workers)
+
+
+def get_job_manager() -> "JobManager":
+    """Get the job manager, importing libraries.jobs on first use.
+
+    Returns:
+        job_manager (JobManager): The process-wide job manager.
+    """
+    from libraries.jobs import job_manager
+
+    return job_manager
+
+
+def run_steps(job: "Job", steps: int) -> str:
+    """Run a task step by step, stopping early if the job is cancelled.
+
+    Args:
+        job (Job): The job running the task.
+        steps (int): Number of steps.
+
+    Returns:
+        result (str): The completion message.
+    """
+    for i in range(steps):
+        if job.cancel_requested:
+            return f"Task '{job.name}' cancelled at step {i + 1}/{steps}"
+        time.sleep(1)
+        job.report_progress((i + 1) / steps, f"Step {i + 1}/{steps}")
+    return f"Task '{job.name}' completed"
+
+
+async def wait_job(job: "Job", ctx: Context) -> None:
+    """Wait for a job without blocking the event loop, forwarding its progress to the client.
+
+    Args:
+        job (Job): The job to wait for.
+        ctx (Context): The MCP context of the tool call.
+    """
+    reported = None
+    while True:
+        done = job.done
+        if job.message and job.message != reported:
+            reported = job.message
+            await ctx.report_progress(progress=job.progress, total=1.0, message=job.message)
+            await ctx.info(f"{job.name}: {job.message}")
+        if done:
+            return
+        await asyncio.sleep(JOB_POLL_INTERVAL)
 
 
 def register_tools(mcp: FastMCP) -> None:
     """Register tools."""
+    register_file_tools(mcp)
+    register_task_tools(mcp)
+    register_server_tools(mcp, prometheus_file=os.environ.get(PROMETHEUS_FILE_ENV))
+
+
+def register_file_tools(mcp: FastMCP, max_workers: int = FILE_IO_MAX_WORKERS) -> None:
+    """Register file system tools.
+
+    Args:
+        mcp (FastMCP): The MCP server.
+        max_workers (int): Maximum number of concurrent file operations. Defaults to 8.
+    """
 
     @mcp.tool()
-    def show_file_list() -> str:
+    @metrics.instrument
+    async def show_file_list() -> str:
         """Show file list."""
-        files_list = FileSystem().show_file_list()
+        files_list = await get_filesystem(max_workers).show_file_list()
         return json.dumps(files_list)
 
     @mcp.tool()
-    def show_filepath(filename: str) -> str:
+    @metrics.instrument
+    async def list_files(
+        pattern: str = "*",
+        recursive: bool = True,
+        extensions: list[str] | None = None,
+        offset: int = 0,
+        limit: int = 1000,
+    ) -> str:
+        """List files with size and mtime under the base directory. Filter by glob pattern on the relative path or by extensions, and page with offset/limit until next_offset is null."""
+        files = await get_filesystem(max_workers).list_files(pattern=pattern, recursive=recursive, extensions=extensions, offset=offset, limit=limit)
+        return json.dumps(files)
+
+    @mcp.tool()
+    @metrics.instrument
+    async def show_filepath(filename: str) -> str:
         """Show file path."""
-        filepath = FileSystem().show_filepath(filename)
+        filepath = await get_filesystem(max_workers).show_filepath(filename)
         return json.dumps(filepath)
 
     @mcp.tool()
-    def load_file_content(filename: str) -> str:
+    @metrics.instrument
+    async def load_file_content(filename: str) -> str:
         """Load file content."""
-        content = FileSystem().load_file_content(filename)
+        content = await get_filesystem(max_workers).load_file_content(filename)
+        return json.dumps(content)
+
+    @mcp.tool()
+    @metrics.instrument
+    async def load_file_chunk(filename: str, offset: int = 0, length: int = DEFAULT_CHUNK_SIZE) -> str:
+        """Load a chunk of file content. Pass the returned next_offset as offset to read the next chunk until eof is true."""
+        chunk = await get_filesystem(max_workers).load_file_chunk(filename, offset=offset, length=length)
+        return json.dumps(chunk)
+
+    @mcp.tool()
+    @metrics.instrument
+    async def load_binary_chunk(filename: str, offset: int = 0, length: int = BINARY_CHUNK_SIZE, compression: str | None = None) -> str:
+        """Load a chunk of a binary file such as PDF, PPTX or DOCX as base64, optionally "gzip" or "zstd" compressed. Pass the returned next_offset as offset to read the next chunk until eof is true."""
+        chunk = await get_filesystem(max_workers).load_binary_chunk(filename, offset=offset, length=length, compression=compression)
+        return json.dumps(chunk)
+
+    @mcp.tool()
+    @metrics.instrument
+    async def read_range(filename: str, start: int, end: int) -> str:
+        """Read the bytes of a file from start (inclusive) to end (exclusive)."""
+        content = await get_filesystem(max_workers).read_range(filename, start, end)
         return json.dumps(content)
 
     @mcp.tool()
+    @metrics.instrument
+    async def read_lines(filename: str, first: int, last: int) -> str:
+        """Read lines of a file from first to last, 1-based and inclusive."""
+        content = await get_filesystem(max_workers).read_lines(filename, first, last)
+        return json.dumps(content)
+
+    @mcp.tool()
+    @metrics.instrument
+    async def search_files(pattern: str, glob: str = "*", max_results: int = 100, ignore_case: bool = False) -> str:
+        """Search files under the base directory for lines matching a regular expression. Returns path, line number and text of each match, up to max_results."""
+        result = await get_filesystem(max_workers).search_files(pattern, glob=glob, max_results=max_results, ignore_case=ignore_case)
+        return json.dumps(result)
+
+
+def register_task_tools(mcp: FastMCP) -> None:
+    """Register task tools."""
+
+    @mcp.tool()
+    @metrics.instrument
     async def long_running_task(task_name: str, ctx: Context, steps: int = 5) -> str:
         """Execute a task with progress updates."""
         await ctx.info(f"Starting: {task_name}")
+        job = get_job_manager().submit(task_name, run_steps, steps)
+        try:
+            await wait_job(job, ctx)
+        except asyncio.CancelledError:
+            # the client cancelled the call or disconnected, nobody waits for the job anymore
+            get_job_manager().cancel(job.job_id)
+            raise
+        if job.error is not None:
+            return f"Task '{task_name}' failed: {job.error}"
+        return job.result or f"Task '{task_name}' {job.status}"
+
+    @mcp.tool()
+    @metrics.instrument
+    def start_long_running_task(task_name: str, steps: int = 5) -> str:
+        """Start a task in the background and return its job id. Poll it with job_status and stop it with cancel_job."""
+        job = get_job_manager().submit(task_name, run_steps, steps)
+        return json.dumps(job.to_dict())
+
+    @mcp.tool()
+    @metrics.instrument
+    def job_status(job_id: str) -> str:
+        """Show status, progress and result of a background job."""
+        job = get_job_manager().get(job_id)
+        return json.dumps(job.to_dict() if job else False)
+
+    @mcp.tool()
+    @metrics.instrument
+    def cancel_job(job_id: str) -> str:
+        """Cancel a background job."""
+        return json.dumps(get_job_manager().cancel(job_id))
+
+    @mcp.tool()
+    @metrics.instrument
+    def list_jobs() -> str:
+        """List background jobs."""
+        return json.dumps(get_job_manager().list())
+
+
+def register_server_tools(mcp: FastMCP, prometheus_file: str | None = None) -> None:
+    """Register server tools.
+
+    Args:
+        mcp (FastMCP): The MCP server.
+        prometheus_file (str | None): The file server_stats writes the metrics to in Prometheus text format,
+            set by the server configuration rather than by clients. Defaults to None to write no file.
+    """
+
+    @mcp.tool()
+    def server_stats() -> str:
+        """Show per-tool call counts, p50/p95/p99 latency, bytes in/out and errors, and the file content cache counters."""
+        from libraries.filesystem import content_cache
 
-        for i in range(steps):
-            progress = (i + 1) / steps
-            await ctx.report_progress(
-                progress=progress,
-                total=1.0,
-                message=f"Step {i + 1}/{steps}",
-            )
-            await ctx.info(f"Completed step {i + 1}")
-            time.sleep(1)
-
-        return f"Task '{task_name}' completed"
+        cache_stats = content_cache.stats()
+        if prometheus_file:
+            metrics.dump_prometheus(prometheus_file, gauges={f"mcp_content_cache_{key}": value for key, value in cache_stats.items()})
+        return json.dumps({"tools": metrics.snapshot(), "content_cache": cache_stats})
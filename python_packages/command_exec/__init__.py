@@ -0,0 +1,8 @@
+"""Building blocks shared by the SSH client and the subprocess modules.
+
+Provides:
+- retry: RetryPolicy, the retry policy with exponential backoff and jitter of the run methods.
+- telemetry: CallRecord, Telemetry and JsonlExporter, the records of the run methods, and telemetry, the instance both modules record to.
+
+The modules import it from python_packages, which has to be on the import path, such as with PYTHONPATH=python_packages.
+"""
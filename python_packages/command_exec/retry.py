@@ -0,0 +1,70 @@
+"""Retry policy shared by the run methods of the SSH client and the subprocess modules."""
+
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry policy with exponential backoff and jitter.
+
+    Attributes:
+        max_attempts (int): Maximum number of attempts, including the first one. Defaults to 3.
+        base_delay (float): Seconds to wait before the second attempt. Defaults to 1.
+        multiplier (float): Factor applied to the delay after each attempt. Defaults to 2.
+        max_delay (float): Upper bound of a single delay in seconds. Defaults to 30.
+        jitter (float): Fraction of each delay that is randomized, 0 for none. Defaults to 0.1.
+        max_elapsed (float | None): Do not start another attempt after this many seconds since the first one. Defaults to None.
+        retryable_exit_codes (frozenset[int] | None): Exit statuses that are retried, None to retry any non-zero exit status. Defaults to None.
+        retryable_exceptions (tuple[type[Exception], ...] | None): Exceptions that are retried, other exceptions are raised at once.
+            Defaults to None for the transient exceptions of the caller, see retryable.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    multiplier: float = 2.0
+    max_delay: float = 30.0
+    jitter: float = 0.1
+    max_elapsed: float | None = None
+    retryable_exit_codes: frozenset[int] | None = None
+    retryable_exceptions: tuple[type[Exception], ...] | None = None
+
+    def retryable(self, transient: tuple[type[Exception], ...]) -> tuple[type[Exception], ...]:
+        """Get the exceptions that are retried.
+
+        Args:
+            transient (tuple[type[Exception], ...]): The transient exceptions of the caller, such as a dropped SSH connection.
+
+        Returns:
+            exceptions (tuple[type[Exception], ...]): retryable_exceptions if set, else transient.
+        """
+        return transient if self.retryable_exceptions is None else self.retryable_exceptions
+
+    def delay(self, attempt: int) -> float:
+        """Get the delay before the next attempt.
+
+        Args:
+            attempt (int): The number of the attempt that just failed, starting at 1.
+
+        Returns:
+            delay (float): Seconds to wait.
+        """
+        delay = min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def should_retry(self, attempt: int, elapsed: float, exit_code: int | None = None) -> bool:
+        """Check whether another attempt should be made.
+
+        Args:
+            attempt (int): The number of the attempt that just failed, starting at 1.
+            elapsed (float): Seconds since the first attempt started.
+            exit_code (int | None): The exit status of the failed attempt, None if it raised a retryable exception. Defaults to None.
+
+        Returns:
+            retry (bool): True if the attempt limit, the elapsed time limit and the exit status allow another attempt.
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if self.max_elapsed is not None and elapsed >= self.max_elapsed:
+            return False
+        return exit_code is None or self.retryable_exit_codes is None or exit_code in self.retryable_exit_codes
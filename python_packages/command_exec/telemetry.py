@@ -0,0 +1,259 @@
+"""Telemetry of the run methods, shared by the SSH client and the subprocess modules.
+
+Both modules record their calls to the same telemetry object, so its summary and a trace
+file written by JsonlExporter cover remote and local commands together. A trace file can
+be summarized later with read_trace and summarize, or from the command line:
+
+    PYTHONPATH=python_packages python -m command_exec.telemetry trace.jsonl --top 5
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import asdict, dataclass
+
+TELEMETRY_MAX_RECORDS = 10000  # most recent run calls kept for the telemetry summary
+
+
+@dataclass
+class CallRecord:
+    """Telemetry of one run call.
+
+    Attributes:
+        cmd (str): The command as displayed, such as with passwords masked.
+        host (str | None): The host the command ran on, None for a local command.
+        started_at (float): The start time as a Unix timestamp.
+        duration (float): Seconds spent in the call, including retries.
+        retry_wait (float): Seconds spent waiting between attempts.
+        attempts (int): Number of attempts.
+        exit_code (int | None): The exit status of the last attempt, None if it did not complete.
+        stdout_bytes (int): Size of the returned stdout in bytes.
+        stderr_bytes (int): Size of the returned stderr in bytes.
+        error (str | None): The exception raised by the call, if any.
+    """
+
+    cmd: str
+    host: str | None = None
+    started_at: float = 0.0
+    duration: float = 0.0
+    retry_wait: float = 0.0
+    attempts: int = 0
+    exit_code: int | None = None
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    error: str | None = None
+
+    def set_output(self, exit_code: int | None, stdout: str, stderr: str) -> None:
+        """Record the outcome of the last attempt.
+
+        Args:
+            exit_code (int | None): The exit status.
+            stdout (str): The standard output.
+            stderr (str): The standard error.
+        """
+        self.exit_code = exit_code
+        self.stdout_bytes = len(stdout.encode("utf-8", errors="ignore"))
+        self.stderr_bytes = len(stderr.encode("utf-8", errors="ignore"))
+
+
+class Telemetry:
+    """Record the calls of the run methods and pass each record to the registered hooks.
+
+    Attributes:
+        enabled (bool): Whether calls are recorded. Defaults to True.
+        records (deque[CallRecord]): The most recent records.
+        hooks (list[Callable[[CallRecord], None]]): Called with each record, such as a JsonlExporter.
+    """
+
+    def __init__(self, max_records: int = TELEMETRY_MAX_RECORDS, enabled: bool = True) -> None:
+        """Initialize Telemetry.
+
+        Args:
+            max_records (int): Number of recent records kept for the summary. Defaults to 10000.
+            enabled (bool): Whether calls are recorded. Defaults to True.
+        """
+        self.enabled = enabled
+        self.records: deque[CallRecord] = deque(maxlen=max_records)
+        self.hooks: list[Callable[[CallRecord], None]] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Callable[[CallRecord], None]) -> None:
+        """Register a hook called with each record.
+
+        Args:
+            hook (Callable[[CallRecord], None]): The hook.
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[CallRecord], None]) -> None:
+        """Unregister a hook.
+
+        Args:
+            hook (Callable[[CallRecord], None]): The hook.
+        """
+        self.hooks.remove(hook)
+
+    @contextlib.contextmanager
+    def track(self, cmd: str, host: str | None = None) -> Iterator[CallRecord]:
+        """Time a call and record it on exit, along with the exception it raised, if any.
+
+        The caller counts attempts and retry waits and sets the output on the yielded record.
+
+        Args:
+            cmd (str): The command as displayed, such as with passwords masked.
+            host (str | None): The host the command runs on. Defaults to None for a local command.
+
+        Yields:
+            record (CallRecord): The record of the call.
+        """
+        record = CallRecord(cmd, host, started_at=time.time())
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.duration = time.perf_counter() - start
+            if self.enabled:
+                self.record(record)
+
+    def record(self, record: CallRecord) -> None:
+        """Keep a record and pass it to the hooks.
+
+        Args:
+            record (CallRecord): The record.
+        """
+        with self._lock:
+            self.records.append(record)
+        for hook in list(self.hooks):
+            # a failing hook, such as a closed exporter, must not replace the outcome of the recorded call
+            try:
+                hook(record)
+            except Exception as e:
+                logging.error(f"Error with telemetry hook {hook!r}: {e}")
+
+    def summary(self, top: int = 10) -> dict:
+        """Aggregate the kept records, see summarize.
+
+        Args:
+            top (int): Number of entries in the slowest and retry hotspot lists. Defaults to 10.
+
+        Returns:
+            summary (dict): The summary of the records.
+        """
+        with self._lock:
+            records = list(self.records)
+        return summarize(records, top=top)
+
+    def clear(self) -> None:
+        """Forget the kept records."""
+        with self._lock:
+            self.records.clear()
+
+
+class JsonlExporter:
+    """Telemetry hook appending each record to a trace file as a JSON line.
+
+    Attributes:
+        filepath (str): The trace file.
+    """
+
+    def __init__(self, filepath: str) -> None:
+        """Initialize JsonlExporter, opening the trace file for appending.
+
+        Args:
+            filepath (str): The trace file.
+        """
+        self.filepath = filepath
+        self._file = open(filepath, "a", encoding="utf-8")  # noqa: SIM115
+        self._lock = threading.Lock()
+
+    def __call__(self, record: CallRecord) -> None:
+        """Append a record to the trace file.
+
+        Args:
+            record (CallRecord): The record.
+        """
+        line = json.dumps(asdict(record)) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close the trace file."""
+        with self._lock:
+            self._file.close()
+
+
+def summarize(records: Iterable[CallRecord], top: int = 10) -> dict:
+    """Aggregate records of SSH and local calls.
+
+    Args:
+        records (Iterable[CallRecord]): The records, such as Telemetry.records or read_trace of a trace file.
+        top (int): Number of entries in the slowest and retry hotspot lists. Defaults to 10.
+
+    Returns:
+        summary (dict): The number of calls, failures, total and retry wait seconds, the calls per host
+            ("local" for local commands), the slowest calls and the commands with the most retries.
+    """
+    records = list(records)
+    by_cmd: dict[tuple[str, str | None], dict] = {}
+    hosts: dict[str, int] = {}
+    for record in records:
+        stats = by_cmd.setdefault((record.cmd, record.host), {"cmd": record.cmd, "host": record.host, "calls": 0, "retries": 0, "retry_wait": 0.0, "duration": 0.0})
+        stats["calls"] += 1
+        stats["retries"] += max(record.attempts - 1, 0)
+        stats["retry_wait"] += record.retry_wait
+        stats["duration"] += record.duration
+        host = record.host or "local"
+        hosts[host] = hosts.get(host, 0) + 1
+    return {
+        "calls": len(records),
+        "failures": sum(record.error is not None or record.exit_code != 0 for record in records),
+        "duration": sum(record.duration for record in records),
+        "retry_wait": sum(record.retry_wait for record in records),
+        "hosts": hosts,
+        "slowest": [asdict(record) for record in sorted(records, key=lambda record: record.duration, reverse=True)[:top]],
+        "retry_hotspots": sorted((stats for stats in by_cmd.values() if stats["retries"]), key=lambda stats: (stats["retries"], stats["retry_wait"]), reverse=True)[:top],
+    }
+
+
+def read_trace(filepath: str) -> list[CallRecord]:
+    """Read the records of a trace file written by JsonlExporter.
+
+    Args:
+        filepath (str): The trace file.
+
+    Returns:
+        records (list[CallRecord]): The records, in the order they were written.
+    """
+    with open(filepath, encoding="utf-8") as fp:
+        return [CallRecord(**json.loads(line)) for line in fp if line.strip()]
+
+
+telemetry = Telemetry()  # shared by the run methods of sshclient.py and subproc.py
+
+
+def main() -> int:
+    """Print the summary of a trace file.
+
+    Returns:
+        status (int): 0.
+    """
+    parser = argparse.ArgumentParser(description="Summarize a telemetry trace file written by JsonlExporter.")
+    parser.add_argument("filepath", help="the trace file")
+    parser.add_argument("--top", type=int, default=10, help="number of entries in the slowest and retry hotspot lists")
+    args = parser.parse_args()
+    print(json.dumps(summarize(read_trace(args.filepath), top=args.top), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Benchmark the per-run overhead of the plain and the pydantic SSH clients.
+
+Runs a command many times on each client with a fake paramiko connection that answers
+immediately, so the timings measure the Python overhead of run (channel handling, output
+decoding and attribute validation) without any network I/O, and times the exit_status
+assignment alone, which run does after every command.
+
+Usage:
+    PYTHONPATH=python_packages python python_packages/paramiko/bench_run_overhead.py --runs 20000
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from collections.abc import Callable
+
+import paramiko
+import sshclient
+import sshclient_pydantic
+
+OUTPUT = b"0.42 0.37 0.31 1/123 4567\n"
+
+
+class FakeChannel:
+    """Channel of a command that has already finished with OUTPUT on stdout."""
+
+    def __init__(self) -> None:
+        """Initialize FakeChannel instance."""
+        self._stdout = OUTPUT
+        self.eof_received = False
+        self.closed = False
+
+    def exec_command(self, cmd: str) -> None:
+        """Start the command."""
+
+    def recv_ready(self) -> bool:
+        """Get whether stdout data is buffered."""
+        return bool(self._stdout)
+
+    def recv(self, size: int) -> bytes:
+        """Read stdout data, reaching EOF once it is consumed."""
+        data, self._stdout = self._stdout[:size], self._stdout[size:]
+        self.eof_received = not self._stdout
+        return data
+
+    def recv_stderr_ready(self) -> bool:
+        """Get whether stderr data is buffered."""
+        return False
+
+    def recv_exit_status(self) -> int:
+        """Get the exit status."""
+        return 0
+
+    def close(self) -> None:
+        """Close the channel."""
+        self.closed = True
+
+
+class FakeTransport:
+    """Transport opening fake channels."""
+
+    def open_session(self) -> FakeChannel:
+        """Open a channel."""
+        return FakeChannel()
+
+
+class FakeFile(io.BytesIO):
+    """Output file of exec_command carrying its channel."""
+
+    def __init__(self, data: bytes) -> None:
+        """Initialize FakeFile instance."""
+        super().__init__(data)
+        self.channel = FakeChannel()
+
+
+class FakeSSHClient(paramiko.SSHClient):
+    """Paramiko SSH client answering every command with OUTPUT, without a connection."""
+
+    def get_transport(self) -> FakeTransport:
+        """Get the transport."""
+        return FakeTransport()
+
+    def exec_command(self, cmd: str, timeout: int | None = None) -> tuple[None, FakeFile, FakeFile]:
+        """Run a command."""
+        return None, FakeFile(OUTPUT), FakeFile(b"")
+
+
+def measure(fn: Callable[[], object], runs: int) -> float:
+    """Time the calls of a function.
+
+    Args:
+        fn (Callable[[], object]): The function, such as a run call of a client.
+        runs (int): Number of calls.
+
+    Returns:
+        seconds (float): The time per call in seconds.
+    """
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Returns:
+        status (int): 0.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20000, help="number of run calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="number of measurements per client")
+    args = parser.parse_args()
+
+    plain = sshclient.SSHClient("127.0.0.1", "user", "password")
+    plain.client = FakeSSHClient()
+    clients = {
+        "sshclient.SSHClient": plain,
+        "sshclient_pydantic.SSHClient": sshclient_pydantic.SSHClient(host="127.0.0.1", username="user", password="password", client=FakeSSHClient()),
+        "sshclient_pydantic.SSHClient(validate_once=True)": sshclient_pydantic.SSHClient(
+            host="127.0.0.1",
+            username="user",
+            password="password",
+            client=FakeSSHClient(),
+            validate_once=True,
+        ),
+    }
+
+    for name, client in clients.items():
+        run_seconds = statistics.median(measure(lambda client=client: client.run("cat /proc/loadavg"), args.runs) for _ in range(args.repeat))
+        assign_seconds = statistics.median(measure(lambda client=client: setattr(client, "exit_status", 0), args.runs) for _ in range(args.repeat))
+        print(f"{name:50} {run_seconds * 1e6:8.2f} us per run {assign_seconds * 1e6:8.3f} us per exit_status assignment")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,385 @@
 """SSH client module for paramiko-based SSH operations.
 
 This module provides the SSHClient class for connecting to SSH servers,
-executing commands, and managing connection parameters using paramiko.
+executing commands, and managing connection parameters using paramiko,
+the SSHConnectionPool class for reusing authenticated connections,
+run_on_hosts for running a command on many SSH servers concurrently,
+the ShellSession class for running many small commands in one long-lived remote shell, and
+the AsyncSSHClient class for driving SSH sessions from asyncio.
+Each run call is recorded by the telemetry shared with subproc.py, see command_exec.telemetry.
+
+The shared command_exec package is imported from python_packages, which has to be on the import path:
+
+    PYTHONPATH=python_packages python python_packages/paramiko/sshclient.py
 """
 
+import asyncio
 import atexit
+import codecs
+import concurrent.futures
+import hashlib
+import json
+import os
+import posixpath
+import select
+import shlex
+import stat
+import threading
 import time
+import uuid
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from dataclasses import dataclass, replace
 from ipaddress import IPv4Address
 
 import paramiko
+from command_exec.retry import RetryPolicy
+from command_exec.telemetry import telemetry
+
+PoolKey = tuple[str, int, str]  # (host, port, username)
+SFTP_WINDOW_SIZE = 16 * 1024 * 1024  # flow-control window of SFTP channels, large enough to keep pipelined requests in flight
+SFTP_PREFETCH_REQUESTS = 64  # read requests kept in flight per downloaded file
+SYNC_BLOCK_SIZE = 1024 * 1024  # bytes per block compared by sync_dir
+SHELL_SESSION_COMMAND = "/bin/sh"  # long-lived shell started by ShellSession
+ASYNC_BLOCKING_WORKERS = 32  # threads shared by all AsyncSSHClient instances for handshakes and channel setup
+ASYNC_POLL_MIN_INTERVAL = 0.005  # seconds between polls of a busy channel
+ASYNC_POLL_MAX_INTERVAL = 0.1  # seconds between polls of an idle channel
+OUTPUT_MAX_LINE = 65536  # characters buffered for a line without a newline before it is yielded in parts
+SSH_TRANSIENT_EXCEPTIONS = (paramiko.SSHException, EOFError, ConnectionError)  # retried unless the RetryPolicy sets retryable_exceptions
+# also retried while reconnecting, when the server is briefly unreachable or the connect times out
+SSH_RECONNECT_EXCEPTIONS = (*SSH_TRANSIENT_EXCEPTIONS, paramiko.ssh_exception.NoValidConnectionsError, TimeoutError)
+
+# computes the sha256 of every block of the files listed on stdin, run on the SSH server by sync_dir
+# prints one JSON line per file, so the idle timeout of the command only bounds the hashing of a single file
+REMOTE_BLOCK_HASHES_SCRIPT = """
+import hashlib, json, sys
+block_size, paths = json.load(sys.stdin)
+for path in paths:
+    try:
+        with open(path, "rb") as fp:
+            hashes = [hashlib.sha256(block).hexdigest() for block in iter(lambda: fp.read(block_size), b"")]
+    except OSError:
+        hashes = None
+    print(json.dumps([path, hashes]), flush=True)
+"""
+
+
+@dataclass
+class CommandResult:
+    """Result of a command run on an SSH server.
+
+    Attributes:
+        host (str): The SSH server host.
+        cmd (str): The command.
+        stdout (str): The standard output, stripped.
+        stderr (str): The standard error, stripped.
+        exit_status (int | None): The exit status, None if the command could not be run.
+        duration (float): Seconds from start to completion, including connecting.
+        error (str | None): The error message if connecting or running the command raised. Defaults to None.
+    """
+
+    host: str
+    cmd: str
+    stdout: str
+    stderr: str
+    exit_status: int | None
+    duration: float
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Get whether the command succeeded.
+
+        Returns:
+            ok (bool): True if the exit status is 0.
+        """
+        return self.exit_status == 0
+
+
+@dataclass
+class TransferResult:
+    """Result of a file transfer.
+
+    Attributes:
+        source (str): The source path.
+        destination (str): The destination path.
+        size (int): The number of bytes transferred, 0 if skipped or failed.
+        duration (float): Seconds spent on the file.
+        skipped (bool): True if the destination was unchanged and not transferred.
+        error (str | None): The error message if the transfer raised. Defaults to None.
+    """
+
+    source: str
+    destination: str
+    size: int
+    duration: float
+    skipped: bool
+    error: str | None = None
+
+
+@dataclass
+class TransferReport:
+    """Results of a bulk file transfer.
+
+    Attributes:
+        results (list[TransferResult]): The result of each file, in completion order.
+        duration (float): Wall time of the whole transfer in seconds.
+    """
+
+    results: list[TransferResult]
+    duration: float
+
+    @property
+    def transferred(self) -> int:
+        """Get the number of bytes transferred.
+
+        Returns:
+            transferred (int): Total bytes of the files transferred.
+        """
+        return sum(result.size for result in self.results)
+
+    @property
+    def throughput(self) -> float:
+        """Get the transfer throughput.
+
+        Returns:
+            throughput (float): Bytes transferred per second of wall time.
+        """
+        return self.transferred / self.duration if self.duration else 0.0
+
+    @property
+    def failed(self) -> list[TransferResult]:
+        """Get the failed transfers.
+
+        Returns:
+            failed (list[TransferResult]): The results with an error.
+        """
+        return [result for result in self.results if result.error]
+
+    def summary(self) -> str:
+        """Summarize the transfer.
+
+        Returns:
+            summary (str): Number of files transferred, skipped and failed, bytes and throughput.
+        """
+        skipped = sum(result.skipped for result in self.results)
+        done = len(self.results) - skipped - len(self.failed)
+        return f"{done} transferred, {skipped} skipped, {len(self.failed)} failed, {self.transferred} bytes in {self.duration:.2f}s ({self.throughput / 1024 / 1024:.2f} MiB/s)"
+
+
+class _OutputDecoder:
+    """Decode the stdout and stderr chunks of a channel into text chunks or lines, up to a byte limit.
+
+    A line without a newline is yielded in parts of OUTPUT_MAX_LINE characters, so it neither
+    grows without bound nor is copied again on every chunk.
+    """
+
+    def __init__(self, lines: bool, max_bytes: int | None) -> None:
+        """Initialize _OutputDecoder instance."""
+        self.lines = lines
+        self.max_bytes = max_bytes
+        self.received = 0
+        self.truncated = False
+        self._decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="ignore") for name in ("stdout", "stderr")}
+        # the pieces of the unfinished line, joined once it ends
+        self._pending: dict[str, list[str]] = {"stdout": [], "stderr": []}
+        self._pending_size = {"stdout": 0, "stderr": 0}
+
+    def decode(self, name: str, data: bytes) -> list[tuple[str, str]]:
+        """Decode a chunk, returning the complete lines or the text chunk it yields."""
+        if self.max_bytes is not None and self.received + len(data) >= self.max_bytes:
+            data = data[: self.max_bytes - self.received]
+            self.truncated = True
+        self.received += len(data)
+        text = self._decoders[name].decode(data)
+        if not self.lines:
+            return [(name, text)] if text else []
+
+        pending = self._pending[name]
+        first, *rest = text.split("\n")
+        pending.append(first)
+        self._pending_size[name] += len(first)
+        complete = []
+        if rest:
+            *middle, last = rest
+            complete = ["".join(pending), *middle]
+            pending[:] = [last]
+            self._pending_size[name] = len(last)
+        if self._pending_size[name] >= OUTPUT_MAX_LINE:
+            complete.append("".join(pending))
+            pending.clear()
+            self._pending_size[name] = 0
+        return [(name, line) for line in complete]
+
+    def flush(self) -> list[tuple[str, str]]:
+        """Return the text left over once the channel reached EOF."""
+        outputs = []
+        for name, decoder in self._decoders.items():
+            text = "".join(self._pending[name]) + decoder.decode(b"", final=True)
+            self._pending[name].clear()
+            if text:
+                outputs.append((name, text))
+        return outputs
+
+
+class SSHConnectionPool:
+    """Thread-safe pool of authenticated paramiko SSH clients keyed by (host, port, username).
+
+    Connections are reused most recently released first. An idle connection is closed after
+    idle_timeout seconds, and a connection is health checked before it is handed out again.
+
+    Attributes:
+        max_size (int): Maximum number of connections per key, idle or in use. Defaults to 4.
+        idle_timeout (float): Seconds an idle connection is kept open. Defaults to 300.
+        keepalive_interval (int): Seconds between keepalive packets on pooled transports, 0 to disable. Defaults to 30.
+        hits (int): Number of acquisitions served by an idle connection.
+        misses (int): Number of acquisitions that opened a new connection.
+        evictions (int): Number of connections closed because they were idle too long or unhealthy.
+    """
+
+    def __init__(self, max_size: int = 4, idle_timeout: float = 300, keepalive_interval: int = 30) -> None:
+        """Initialize SSHConnectionPool instance.
+
+        Registers the close_all method to be called at exit.
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._idle: defaultdict[PoolKey, list[tuple[float, paramiko.SSHClient]]] = defaultdict(list)
+        self._in_use: defaultdict[PoolKey, int] = defaultdict(int)
+        self._cond = threading.Condition()
+        atexit.register(self.close_all)
+
+    @staticmethod
+    def _is_healthy(client: paramiko.SSHClient) -> bool:
+        """Check whether the transport of a client is still usable."""
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except (EOFError, OSError, paramiko.SSHException):
+            return False
+        return True
+
+    def _evict_idle(self) -> list[paramiko.SSHClient]:
+        """Remove the idle connections that exceeded the idle timeout. Must be called with the lock held."""
+        expired = []
+        now = time.monotonic()
+        for idle in self._idle.values():
+            expired += [client for released_at, client in idle if now - released_at > self.idle_timeout]
+            idle[:] = [(released_at, client) for released_at, client in idle if now - released_at <= self.idle_timeout]
+        self.evictions += len(expired)
+        return expired
+
+    def acquire(self, host: str, port: int, username: str, password: str, timeout: float = 10) -> paramiko.SSHClient:
+        """Acquire a connected client, reusing an idle connection if there is a healthy one.
+
+        Args:
+            host (str): The SSH server host.
+            port (int): The SSH server port.
+            username (str): The SSH username.
+            password (str): The SSH password, used when a new connection is opened.
+            timeout (float): Seconds to wait for a free slot and to connect. Defaults to 10.
+
+        Returns:
+            client (paramiko.SSHClient): The connected client. Give it back with release.
+
+        Raises:
+            TimeoutError: If max_size connections to the key stay in use for timeout seconds.
+        """
+        key = (host, port, username)
+        deadline = time.monotonic() + timeout
+        while True:
+            client = None
+            with self._cond:
+                expired = self._evict_idle()
+                if self._idle[key]:
+                    _, client = self._idle[key].pop()
+                    self._in_use[key] += 1
+                elif self._in_use[key] < self.max_size:
+                    self._in_use[key] += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No free connection to {username}@{host}:{port} in the pool")
+                    self._cond.wait(remaining)
+                    continue
+            for expired_client in expired:
+                expired_client.close()
+
+            if client is not None:
+                if self._is_healthy(client):
+                    with self._cond:
+                        self.hits += 1
+                    return client
+                client.close()
+                with self._cond:
+                    self.evictions += 1
+                    self._in_use[key] -= 1
+                    self._cond.notify()
+                continue
+
+            try:
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(hostname=host, port=port, username=username, password=password, timeout=timeout)
+                if self.keepalive_interval:
+                    client.get_transport().set_keepalive(self.keepalive_interval)
+            except Exception:
+                with self._cond:
+                    self._in_use[key] -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.misses += 1
+            return client
+
+    def release(self, client: paramiko.SSHClient, host: str, port: int, username: str) -> None:
+        """Give a client back to the pool. A client whose transport is no longer active is closed.
+
+        Args:
+            client (paramiko.SSHClient): The client returned by acquire.
+            host (str): The SSH server host.
+            port (int): The SSH server port.
+            username (str): The SSH username.
+        """
+        key = (host, port, username)
+        transport = client.get_transport()
+        active = transport is not None and transport.is_active()
+        with self._cond:
+            self._in_use[key] = max(self._in_use[key] - 1, 0)
+            if active:
+                self._idle[key].append((time.monotonic(), client))
+            self._cond.notify()
+        if not active:
+            client.close()
+
+    def close_all(self) -> None:
+        """Close all idle connections. Connections in use are closed when they are released."""
+        with self._cond:
+            idle = [client for clients in self._idle.values() for _, client in clients]
+            self._idle.clear()
+        for client in idle:
+            client.close()
+
+    def stats(self) -> dict:
+        """Get the pool statistics.
+
+        Returns:
+            stats (dict): The hit, miss and eviction counters and the number of idle and in-use connections.
+        """
+        with self._cond:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "idle": sum(len(clients) for clients in self._idle.values()),
+                "in_use": sum(self._in_use.values()),
+            }
 
 
 class SSHClient:
@@ -22,10 +393,13 @@ class SSHClient:
         _username (str): The SSH username.
         _password (str): The SSH password.
         _port (int): The SSH server port. Defaults to 22.
+        pool (SSHConnectionPool | None): The pool to take connections from. Defaults to None.
+        client (paramiko.SSHClient | None): The paramiko SSH client instance while connected.
+        sftp (paramiko.SFTPClient | None): The SFTP session opened by open_sftp while connected.
         exit_status (int | None): Previous exit status of run method.
     """
 
-    def __init__(self, host: str, username: str, password: str, port: int = 22) -> None:
+    def __init__(self, host: str, username: str, password: str, port: int = 22, pool: SSHConnectionPool | None = None) -> None:
         """Initialize SSHClient instance.
 
         Sets up the paramiko SSH client and initializes connection parameters.
@@ -34,7 +408,11 @@ class SSHClient:
         self._username = username
         self._password = password
         self._port = port
+        self.pool = pool
+        self.client = None
+        self.sftp = None
         self.exit_status = None  # previous exit status of run method
+        self._close_at_exit = False
 
     @property
     def host(self) -> str:
@@ -130,26 +508,47 @@ class SSHClient:
     def connect(self) -> None:
         """Connect to the SSH server.
 
-        Registers the close method to be called at exit.
+        Takes a connection from the pool if one is set. Registers the close method to be called at exit.
         """
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client.connect(
-            hostname=self.host,
-            port=self.port,
-            username=self.username,
-            password=self.password,
-            timeout=10,
-        )
-        atexit.register(self.close)
+        if self.pool is not None:
+            self.client = self.pool.acquire(self.host, self.port, self.username, self.password)
+        else:
+            self.client = paramiko.SSHClient()
+            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            self.client.connect(
+                hostname=self.host,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                timeout=10,
+            )
+        if not self._close_at_exit:
+            atexit.register(self.close)
+            self._close_at_exit = True
 
     def close(self) -> None:
         """Close the SSH connection.
 
-        Closes the paramiko SSH client if it exists.
+        Gives the connection back to the pool if one is set, else closes the paramiko SSH client if it exists.
         """
+        if self.sftp:
+            self.sftp.close()
+            self.sftp = None
         if self.client:
-            self.client.close()
+            if self.pool is not None:
+                self.pool.release(self.client, self.host, self.port, self.username)
+            else:
+                self.client.close()
+            self.client = None
+
+    def is_active(self) -> bool:
+        """Check whether the connection is open and its transport is still up.
+
+        Returns:
+            active (bool): True if connected and the transport is active.
+        """
+        transport = self.client.get_transport() if self.client is not None else None
+        return transport is not None and transport.is_active()
 
     def run(
         self,
@@ -157,34 +556,919 @@ class SSHClient:
         timeout: int = 60,
         retry: int = 3,
         return_err: bool = False,
+        retry_policy: RetryPolicy | None = None,
+        display: str | None = None,
     ) -> str:
-        """Run a command on the SSH server and return the output.
+        """Run a command on the SSH server and return the output, retried as described in execute.
 
         Args:
             cmd (str): The command to execute on the server.
             timeout (int, optional): Timeout for command execution in seconds. Defaults to 60.
-            retry (int, optional): Number of retries if command fails. Defaults to 3.
+            retry (int, optional): Number of attempts if command fails, ignored if retry_policy is set. Defaults to 3.
             return_err (bool, optional): If True, return stderr output. Defaults to False.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to RetryPolicy(max_attempts=retry).
+            display (str | None, optional): The command shown in telemetry, such as with passwords masked. Defaults to cmd.
 
         Returns:
             stdout_or_stderr (str): The command output (stdout or stderr).
         """
-        for _ in range(retry):
-            stdin, stdout, stderr = self.client.exec_command(cmd, timeout=timeout)
-            ret = stdout.read().decode("utf-8", errors="ignore")
-            ret_err = stderr.read().decode("utf-8", errors="ignore")
+        result = self.execute(cmd, timeout=timeout, retry_policy=retry_policy or RetryPolicy(max_attempts=retry), display=display)
+
+        # returns stderr if exit status is not equal to 0
+        if return_err or result.exit_status != 0:
+            return result.stderr
+
+        return result.stdout
+
+    def execute(self, cmd: str, timeout: int = 60, retry_policy: RetryPolicy | None = None, display: str | None = None, stdin: bytes | None = None) -> CommandResult:
+        """Run a command on the SSH server and return both outputs and the exit status.
+
+        Failed attempts are retried with exponential backoff. If the connection drops, it is
+        reopened before the next attempt, else the next attempt reuses it, such as after the
+        server rejected a channel. The call is recorded by the shared telemetry, see command_exec.telemetry.
+
+        Args:
+            cmd (str): The command to execute on the server.
+            timeout (int, optional): Timeout for command execution in seconds. Defaults to 60.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to None for a single attempt.
+            display (str | None, optional): The command shown in telemetry, such as with passwords masked. Defaults to cmd.
+            stdin (bytes | None, optional): Data written to the standard input of the command of each attempt. Defaults to None.
+
+        Returns:
+            result (CommandResult): The stripped stdout and stderr and exit status of the last attempt, and the duration of all attempts.
+        """
+        policy = retry_policy or RetryPolicy(max_attempts=1)
+        start = time.monotonic()
+        attempt = 0
+        reconnect = False
+        with telemetry.track(display or cmd, self.host) as call:
+            while True:
+                attempt += 1
+                call.attempts = attempt
+                try:
+                    if reconnect:
+                        self.close()
+                        self.connect()
+                        reconnect = False
+                    result = self._execute_once(cmd, timeout, stdin)
+                # evaluated once raised, so connection errors are only retried while reconnecting, not a command timeout
+                except policy.retryable(SSH_RECONNECT_EXCEPTIONS if reconnect else SSH_TRANSIENT_EXCEPTIONS):
+                    if not policy.should_retry(attempt, time.monotonic() - start):
+                        raise
+                    reconnect = not self.is_active()
+                    delay = policy.delay(attempt)
+                    call.retry_wait += delay
+                    time.sleep(delay)
+                    continue
+
+                if result.exit_status == 0 or not policy.should_retry(attempt, time.monotonic() - start, result.exit_status):
+                    break
+                delay = policy.delay(attempt)
+                call.retry_wait += delay
+                time.sleep(delay)
+            call.set_output(result.exit_status, result.stdout, result.stderr)
+        result.duration = time.monotonic() - start
+        return result
+
+    def _execute_once(self, cmd: str, timeout: int, stdin: bytes | None = None) -> CommandResult:
+        """Run a command once and collect both outputs."""
+        start = time.perf_counter()
+        outputs = {"stdout": [], "stderr": []}
+        for name, text in self.stream(cmd, timeout=timeout, lines=False, stdin=stdin):
+            outputs[name].append(text)
+        ret = "".join(outputs["stdout"])
+        ret_err = "".join(outputs["stderr"])
+        return CommandResult(self.host, cmd, ret.strip(), ret_err.strip(), self.exit_status, time.perf_counter() - start)
+
+    def stream(
+        self,
+        cmd: str,
+        timeout: int = 60,
+        lines: bool = True,
+        chunk_size: int = 32768,
+        max_bytes: int | None = None,
+        stdin: bytes | None = None,
+    ) -> Iterator[tuple[str, str]]:
+        """Run a command on the SSH server and yield its output while it runs.
+
+        Stdout and stderr are read from the channel as either becomes ready, so output is never
+        buffered in full and a command filling one stream cannot block on the other.
+        The exit status is stored in exit_status once the output is consumed.
+
+        Args:
+            cmd (str): The command to execute on the server.
+            timeout (int, optional): Seconds without any output before giving up. Defaults to 60.
+            lines (bool, optional): If True, yield complete lines without the newline, else yield decoded chunks. Defaults to True.
+            chunk_size (int, optional): Maximum bytes read from a stream at once. Defaults to 32768.
+            max_bytes (int | None, optional): Stop after this many bytes of output and close the channel, leaving exit_status None. Defaults to None.
+            stdin (bytes | None, optional): Data written to the standard input of the command before its output is read, which is then closed. Defaults to None.
+
+        Yields:
+            output (tuple[str, str]): The stream name, "stdout" or "stderr", and a line or chunk of its output.
+
+        Raises:
+            TimeoutError: If the command produces no output and does not finish within timeout seconds, or does not read stdin within timeout seconds.
+        """
+        channel = self.client.get_transport().open_session()
+        self.exit_status = None
+        decoder = _OutputDecoder(lines, max_bytes)
+        try:
+            channel.exec_command(cmd)
+            if stdin is not None:
+                # a command that stops reading fails the write once timeout expires, instead of blocking it
+                channel.settimeout(timeout)
+                channel.sendall(stdin)
+                channel.shutdown_write()
+            for name, data in self._recv_chunks(channel, cmd, timeout, chunk_size):
+                yield from decoder.decode(name, data)
+                if decoder.truncated:
+                    return
+            yield from decoder.flush()
+            self.exit_status = channel.recv_exit_status()
+        finally:
+            channel.close()
+
+    def shell_session(self, shell: str = SHELL_SESSION_COMMAND) -> "ShellSession":
+        """Get a long-lived shell session on the connection, see ShellSession.
+
+        Args:
+            shell (str, optional): The remote shell command. Defaults to "/bin/sh".
+
+        Returns:
+            session (ShellSession): The session, opened on its first command.
+        """
+        return ShellSession(self, shell=shell)
+
+    def run_many(self, cmds: list[str], timeout: int = 60, max_channels: int = 10) -> list[CommandResult]:
+        """Run independent commands concurrently over the connection, one channel per command.
+
+        All channels share the authenticated transport and are polled from the calling thread,
+        so the batch takes about as long as its slowest command. Channels are opened at most
+        max_channels at a time, since SSH servers limit sessions per connection (MaxSessions is 10 by default in OpenSSH).
+
+        Args:
+            cmds (list[str]): The commands to execute on the server.
+            timeout (int, optional): Seconds without any output before a command is abandoned. Defaults to 60.
+            max_channels (int, optional): Maximum number of channels open at the same time. Defaults to 10.
+
+        Returns:
+            results (list[CommandResult]): The result of each command, in the order of cmds. A command that timed out has exit_status None and error set.
+        """
+        transport = self.client.get_transport()
+        results: list[CommandResult | None] = [None] * len(cmds)
+        pending = deque(enumerate(cmds))
+        # channel -> [index, start time, time of last output, stdout chunks, stderr chunks]
+        active: dict[paramiko.Channel, list] = {}
+        try:
+            while pending or active:
+                while pending and len(active) < max_channels:
+                    index, cmd = pending.popleft()
+                    channel = transport.open_session()
+                    channel.exec_command(cmd)
+                    now = time.perf_counter()
+                    active[channel] = [index, now, now, [], []]
+
+                # wakes up when data, EOF or close arrives on any channel
+                select.select(list(active), [], [], 1.0)
+                for channel, state in list(active.items()):
+                    result = self._poll_channel(channel, state, cmds[state[0]], timeout)
+                    if result is not None:
+                        results[state[0]] = result
+                        channel.close()
+                        del active[channel]
+        finally:
+            for channel in active:
+                channel.close()
+        return results
+
+    def _poll_channel(self, channel: paramiko.Channel, state: list, cmd: str, timeout: float) -> CommandResult | None:
+        """Read the ready output of a run_many channel and return its result once finished or timed out."""
+        _, start, _, stdout_chunks, stderr_chunks = state
+        now = time.perf_counter()
+        # check EOF before draining, output that arrives before the EOF is buffered by then
+        finished = channel.eof_received or channel.closed
+        while channel.recv_ready():
+            stdout_chunks.append(channel.recv(32768))
+            state[2] = now
+        while channel.recv_stderr_ready():
+            stderr_chunks.append(channel.recv_stderr(32768))
+            state[2] = now
+
+        if not finished and now - state[2] <= timeout:
+            return None
+        ret = b"".join(stdout_chunks).decode("utf-8", errors="ignore").strip()
+        ret_err = b"".join(stderr_chunks).decode("utf-8", errors="ignore").strip()
+        if finished:
+            return CommandResult(self.host, cmd, ret, ret_err, channel.recv_exit_status(), now - start)
+        return CommandResult(self.host, cmd, ret, ret_err, None, now - start, error=f"TimeoutError: No output from {cmd!r} for {timeout} seconds")
+
+    @staticmethod
+    def _recv_chunks(channel: paramiko.Channel, cmd: str, timeout: float, chunk_size: int) -> Iterator[tuple[str, bytes]]:
+        """Yield the raw stdout and stderr chunks of a channel as either becomes ready, until EOF."""
+        last_output = time.monotonic()
+        while True:
+            ready = False
+            if channel.recv_ready():
+                ready = True
+                yield "stdout", channel.recv(chunk_size)
+            if channel.recv_stderr_ready():
+                ready = True
+                yield "stderr", channel.recv_stderr(chunk_size)
+
+            if ready:
+                last_output = time.monotonic()
+            elif channel.eof_received or channel.closed:
+                # output that arrived between the ready checks and the EOF check is still buffered
+                if not (channel.recv_ready() or channel.recv_stderr_ready()):
+                    return
+            else:
+                idle = time.monotonic() - last_output
+                if idle > timeout:
+                    raise TimeoutError(f"No output from {cmd!r} for {timeout} seconds")
+                # the channel becomes readable when data, EOF or close arrives on either stream
+                select.select([channel], [], [], min(timeout - idle, 1.0))
+
+    def _new_sftp(self) -> paramiko.SFTPClient:
+        """Open an SFTP session on the transport with a large window."""
+        return paramiko.SFTPClient.from_transport(self.client.get_transport(), window_size=SFTP_WINDOW_SIZE)
+
+    def open_sftp(self) -> paramiko.SFTPClient:
+        """Open the SFTP session of the connection, reusing it if already open.
+
+        Returns:
+            sftp (paramiko.SFTPClient): The SFTP session, closed by close.
+        """
+        if self.sftp is None:
+            self.sftp = self._new_sftp()
+        return self.sftp
+
+    def put_many(self, files: list[tuple[str, str]], max_workers: int = 4, skip_unchanged: bool = True) -> TransferReport:
+        """Upload files over SFTP, several at a time.
+
+        Each worker opens its own SFTP channel on the connection's transport, so files are sent in parallel
+        without another handshake. Writes are pipelined. The local modification time is copied to the remote
+        file, so a file with the same size and modification time is skipped on the next upload.
+        Missing remote directories are created.
+
+        Args:
+            files (list[tuple[str, str]]): Pairs of (local path, remote path).
+            max_workers (int, optional): Number of files transferred at the same time. Defaults to 4.
+            skip_unchanged (bool, optional): Skip files whose remote size and modification time match. Defaults to True.
+
+        Returns:
+            report (TransferReport): The result of each file and the throughput.
+        """
+        created_dirs = set()
+        lock = threading.Lock()
+
+        def put(sftp: paramiko.SFTPClient, local_path: str, remote_path: str) -> int | None:
+            local_stat = os.stat(local_path)
+            if skip_unchanged and _unchanged(local_stat, _sftp_stat(sftp, remote_path)):
+                return None
+            remote_dir = posixpath.dirname(remote_path)
+            with lock:
+                if remote_dir and remote_dir not in created_dirs:
+                    _sftp_makedirs(sftp, remote_dir)
+                    created_dirs.add(remote_dir)
+            sftp.put(local_path, remote_path)
+            sftp.utime(remote_path, (local_stat.st_atime, local_stat.st_mtime))
+            return local_stat.st_size
+
+        return self._transfer_many(files, put, max_workers)
+
+    def get_many(self, files: list[tuple[str, str]], max_workers: int = 4, skip_unchanged: bool = True) -> TransferReport:
+        """Download files over SFTP, several at a time.
+
+        Each worker opens its own SFTP channel on the connection's transport. Reads are prefetched with
+        many requests in flight. The remote modification time is copied to the local file, so a file with
+        the same size and modification time is skipped on the next download. Missing local directories are created.
+
+        Args:
+            files (list[tuple[str, str]]): Pairs of (remote path, local path).
+            max_workers (int, optional): Number of files transferred at the same time. Defaults to 4.
+            skip_unchanged (bool, optional): Skip files whose local size and modification time match. Defaults to True.
+
+        Returns:
+            report (TransferReport): The result of each file and the throughput.
+        """
+
+        def get(sftp: paramiko.SFTPClient, remote_path: str, local_path: str) -> int | None:
+            remote_stat = sftp.stat(remote_path)
+            try:
+                local_stat = os.stat(local_path)
+            except FileNotFoundError:
+                local_stat = None
+            if skip_unchanged and _unchanged(remote_stat, local_stat):
+                return None
+            os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+            sftp.get(remote_path, local_path, max_concurrent_prefetch_requests=SFTP_PREFETCH_REQUESTS)
+            os.utime(local_path, (remote_stat.st_atime, remote_stat.st_mtime))
+            return remote_stat.st_size
+
+        return self._transfer_many(files, get, max_workers)
+
+    def sync_dir(self, local_dir: str, remote_dir: str, block_size: int = SYNC_BLOCK_SIZE, max_workers: int = 4, timeout: int = 60) -> TransferReport:
+        """Make a remote directory tree match a local one, sending only what changed.
+
+        Files missing on the server are uploaded in full, files with the same size and modification time are
+        skipped. For the other files, the server hashes each block of its copy and only the blocks whose hash
+        differs from the local block are written, then the file is truncated to the local size. Files only
+        present on the server are kept. If python3 is not available on the server, changed files are uploaded in full.
+
+        Args:
+            local_dir (str): The local source directory.
+            remote_dir (str): The remote destination directory.
+            block_size (int, optional): Bytes per compared block. Defaults to 1 MiB.
+            max_workers (int, optional): Number of files transferred at the same time. Defaults to 4.
+            timeout (int, optional): Seconds without progress from the server while it lists the files or hashes one file. Defaults to 60.
+
+        Returns:
+            report (TransferReport): The result of each file, with size the number of bytes actually sent.
+
+        Raises:
+            TimeoutError: If the server makes no progress listing or hashing the files within timeout seconds.
+        """
+        local_files = {}
+        for dirpath, _, filenames in os.walk(local_dir):
+            for filename in filenames:
+                local_path = os.path.join(dirpath, filename)
+                relpath = os.path.relpath(local_path, local_dir).replace(os.sep, "/")
+                local_files[local_path] = (posixpath.join(remote_dir, relpath), os.stat(local_path))
+
+        remote_files = self._list_remote_files(remote_dir, timeout)
+        changed = [remote_path for remote_path, local_stat in local_files.values() if remote_path in remote_files and (local_stat.st_size, int(local_stat.st_mtime)) != remote_files[remote_path]]
+        remote_hashes = self._remote_block_hashes(changed, block_size, timeout) if changed else {}
+        created_dirs = {posixpath.dirname(path) for path in remote_files}
+        lock = threading.Lock()
+
+        def sync(sftp: paramiko.SFTPClient, local_path: str, remote_path: str) -> int | None:
+            local_stat = local_files[local_path][1]
+            if (local_stat.st_size, int(local_stat.st_mtime)) == remote_files.get(remote_path):
+                return None
+            hashes = remote_hashes.get(remote_path)
+            if hashes is None:
+                remote_dir = posixpath.dirname(remote_path)
+                with lock:
+                    if remote_dir not in created_dirs:
+                        _sftp_makedirs(sftp, remote_dir)
+                        created_dirs.add(remote_dir)
+                sftp.put(local_path, remote_path)
+                sent = local_stat.st_size
+            else:
+                sent = _write_changed_blocks(sftp, local_path, remote_path, hashes, block_size, truncate=local_stat.st_size < remote_files[remote_path][0])
+            sftp.utime(remote_path, (local_stat.st_atime, local_stat.st_mtime))
+            return sent
+
+        return self._transfer_many([(local_path, remote_path) for local_path, (remote_path, _) in local_files.items()], sync, max_workers)
+
+    def _list_remote_files(self, remote_dir: str, timeout: int) -> dict[str, tuple[int, int]]:
+        """List the files under a remote directory with one find command, walking it over SFTP if find fails."""
+        result = self.execute(f"find {shlex.quote(remote_dir)} -type f -printf '%p\\t%s\\t%T@\\n'", timeout=timeout)
+        # find exits with 1 when some directories are unreadable, still listing all the other files
+        if result.ok or (result.exit_status == 1 and result.stdout):
+            files = {}
+            for line in result.stdout.splitlines():
+                path, size, mtime = line.rsplit("\t", 2)
+                files[path] = (int(size), int(float(mtime)))
+            return files
+
+        files = {}
+        sftp = self.open_sftp()
+        pending = [remote_dir] if _sftp_stat(sftp, remote_dir) is not None else []
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = sftp.listdir_attr(directory)
+            except OSError:
+                # skipped like find does, such as a directory without read permission
+                continue
+            for attributes in entries:
+                path = posixpath.join(directory, attributes.filename)
+                if stat.S_ISDIR(attributes.st_mode):
+                    pending.append(path)
+                elif stat.S_ISREG(attributes.st_mode):
+                    files[path] = (attributes.st_size, int(attributes.st_mtime))
+        return files
+
+    def _remote_block_hashes(self, paths: list[str], block_size: int, timeout: int) -> dict[str, list[str] | None]:
+        """Hash every block of remote files on the server, returning no hashes if python3 is not available there."""
+        cmd = f"python3 -c {shlex.quote(REMOTE_BLOCK_HASHES_SCRIPT)}"
+        result = self.execute(cmd, timeout=timeout, display="python3 -c <block hashes script>", stdin=json.dumps([block_size, paths]).encode("utf-8"))
+        if not result.ok:
+            return {}
+        return dict(json.loads(line) for line in result.stdout.splitlines())
+
+    def _transfer_many(self, files: list[tuple[str, str]], transfer: Callable[[paramiko.SFTPClient, str, str], int | None], max_workers: int) -> TransferReport:
+        """Run a transfer function on every file pair with a pool of workers, each with its own SFTP session."""
+        local = threading.local()
+        sessions = []
+        lock = threading.Lock()
+
+        def transfer_one(source: str, destination: str) -> TransferResult:
+            start = time.perf_counter()
+            try:
+                if not hasattr(local, "sftp"):
+                    local.sftp = self._new_sftp()
+                    with lock:
+                        sessions.append(local.sftp)
+                size = transfer(local.sftp, source, destination)
+                return TransferResult(source, destination, size or 0, time.perf_counter() - start, skipped=size is None)
+            except Exception as e:
+                return TransferResult(source, destination, 0, time.perf_counter() - start, skipped=False, error=f"{type(e).__name__}: {e}")
+
+        start = time.perf_counter()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(transfer_one, source, destination) for source, destination in files]
+                results = [future.result() for future in concurrent.futures.as_completed(futures)]
+        finally:
+            for sftp in sessions:
+                sftp.close()
+        return TransferReport(results, time.perf_counter() - start)
+
+
+def _sftp_stat(sftp: paramiko.SFTPClient, path: str) -> paramiko.SFTPAttributes | None:
+    """Stat a remote path, returning None if it does not exist."""
+    try:
+        return sftp.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _sftp_makedirs(sftp: paramiko.SFTPClient, path: str) -> None:
+    """Create a remote directory and its missing parents."""
+    missing = []
+    while path and path not in ("/", "."):
+        attributes = _sftp_stat(sftp, path)
+        if attributes is not None:
+            if not stat.S_ISDIR(attributes.st_mode):
+                raise NotADirectoryError(path)
+            break
+        missing.append(path)
+        path = posixpath.dirname(path)
+    for directory in reversed(missing):
+        sftp.mkdir(directory)
+
+
+def _write_changed_blocks(sftp: paramiko.SFTPClient, local_path: str, remote_path: str, remote_hashes: list[str], block_size: int, truncate: bool) -> int:
+    """Write the local blocks whose hash differs from the remote block into the remote file, truncating it to the local size if it is longer."""
+    sent = 0
+    with open(local_path, "rb") as local_fp, sftp.open(remote_path, "r+b") as remote_fp:
+        remote_fp.set_pipelined(True)
+        for index, block in enumerate(iter(lambda: local_fp.read(block_size), b"")):
+            if index < len(remote_hashes) and hashlib.sha256(block).hexdigest() == remote_hashes[index]:
+                continue
+            remote_fp.seek(index * block_size)
+            remote_fp.write(block)
+            sent += len(block)
+        if truncate:
+            remote_fp.truncate(local_fp.tell())
+    return sent
+
+
+def _unchanged(source: os.stat_result | paramiko.SFTPAttributes, destination: os.stat_result | paramiko.SFTPAttributes | None) -> bool:
+    """Check whether a destination has the size and modification time (to the second, as SFTP stores it) of the source."""
+    return destination is not None and source.st_size == destination.st_size and int(source.st_mtime) == int(destination.st_mtime)
+
+
+def run_on_hosts(
+    clients: Iterable[SSHClient],
+    cmd: str,
+    max_workers: int = 32,
+    timeout: int = 60,
+    retry: int = 1,
+    retry_policy: RetryPolicy | None = None,
+    host_timeout: float = 300,
+) -> Iterator[CommandResult]:
+    """Run a command on many SSH servers concurrently and yield the results as they complete.
+
+    Clients that are not connected are connected first and closed afterwards. A host that fails to
+    connect or raises while running the command yields a result with error set instead of stopping the others.
+    A host still running host_timeout seconds after it started yields a result with a TimeoutError set, and
+    its connection is closed to stop the command.
+
+    Args:
+        clients (Iterable[SSHClient]): The host inventory, one client per host.
+        cmd (str): The command to execute on every host.
+        max_workers (int, optional): Maximum number of hosts handled at the same time. Defaults to 32.
+        timeout (int, optional): Timeout for command execution in seconds on each host. Defaults to 60.
+        retry (int, optional): Number of attempts per host if the command fails, ignored if retry_policy is set. Defaults to 1.
+        retry_policy (RetryPolicy | None, optional): The retry policy of each host, see SSHClient.execute. Defaults to RetryPolicy(max_attempts=retry).
+        host_timeout (float, optional): Overall seconds for each host, connecting and all attempts included. Defaults to 300.
+
+    Yields:
+        result (CommandResult): The result of each host, in completion order.
+    """
+    policy = retry_policy or RetryPolicy(max_attempts=retry)
+    # no attempt is started past the deadline of the host
+    policy = replace(policy, max_elapsed=min(policy.max_elapsed or host_timeout, host_timeout))
+    started = {}
+
+    def run_on_host(client: SSHClient) -> CommandResult:
+        """Connect if needed, run the command with retries and capture any error."""
+        started[client] = time.monotonic()
+        start = time.perf_counter()
+        owns_connection = client.client is None
+        try:
+            if owns_connection:
+                client.connect()
+            result = client.execute(cmd, timeout=timeout, retry_policy=policy)
+            result.duration = time.perf_counter() - start
+            return result
+        except Exception as e:
+            return CommandResult(client.host, cmd, "", "", None, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+        finally:
+            if owns_connection:
+                client.close()
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(run_on_host, client): client for client in clients}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            # queued hosts get their deadline once a worker picks them up, checked again after a second
+            deadline = min(started[futures[future]] + host_timeout if futures[future] in started else now + 1 for future in pending)
+            done, pending = concurrent.futures.wait(pending, timeout=max(0, deadline - now), return_when=concurrent.futures.FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+            now = time.monotonic()
+            for future in [future for future in pending if futures[future] in started and now >= started[futures[future]] + host_timeout]:
+                pending.discard(future)
+                client = futures[future]
+                _abort_connection(client)
+                yield CommandResult(client.host, cmd, "", "", None, now - started[client], error=f"TimeoutError: no result within {host_timeout} seconds")
+    finally:
+        # workers of timed out hosts end once their connection is closed, queued hosts are dropped if the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _abort_connection(client: SSHClient) -> None:
+    """Close the transport of a client from another thread, failing the command running on it."""
+    ssh = client.client
+    transport = ssh.get_transport() if ssh is not None else None
+    if transport is not None:
+        transport.close()
+
+
+class ShellSession:
+    """Run commands one after another in one long-lived remote shell instead of a new exec channel each.
+
+    Every exec_command opens a channel and starts a new remote process, which dominates the run time
+    of small commands such as reading /proc files. A session starts the shell once and writes each
+    command to its stdin, followed by sentinel markers on stdout and stderr that carry the exit status.
+
+    Commands run in the same shell, so cd and exported variables persist between them. Each command
+    reads stdin from /dev/null. A command that exits the shell ends the session, and the next command
+    starts a new one. A command that times out closes the session, since its state is unknown.
+
+    Attributes:
+        ssh (SSHClient): The connected client the session runs on.
+        shell (str): The remote shell command.
+        exit_status (int | None): Exit status of the previous command.
+    """
+
+    def __init__(self, ssh: SSHClient, shell: str = SHELL_SESSION_COMMAND) -> None:
+        """Initialize ShellSession instance."""
+        self.ssh = ssh
+        self.shell = shell
+        self.exit_status = None
+        self._channel: paramiko.Channel | None = None
+        self._token = uuid.uuid4().hex
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        """Start the remote shell."""
+        self._channel = self.ssh.client.get_transport().open_session()
+        self._channel.exec_command(self.shell)
+
+    def close(self) -> None:
+        """Exit the remote shell."""
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+
+    def __enter__(self) -> "ShellSession":
+        """Start the remote shell when entering the context."""
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Exit the remote shell when leaving the context."""
+        self.close()
+
+    def execute(self, cmd: str, timeout: int = 60) -> CommandResult:
+        """Run a command in the shell and return both outputs and the exit status.
+
+        Args:
+            cmd (str): The command to execute in the shell.
+            timeout (int, optional): Seconds without any output before giving up. Defaults to 60.
+
+        Returns:
+            result (CommandResult): The stripped stdout and stderr, exit status and duration.
+
+        Raises:
+            TimeoutError: If the command produces no output and does not finish within timeout seconds.
+            EOFError: If the shell exits while running the command.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            if self._channel is None:
+                self.open()
+            self._count += 1
+            marker = f"__shell_session_{self._token}_{self._count}__"
+            self.exit_status = None
+            # command eval keeps a syntax error in cmd from exiting the shell and losing the markers
+            self._channel.sendall(
+                f"command eval {shlex.quote(cmd)} </dev/null; printf '\\n%s %d\\n' {marker} \"$?\"; printf '\\n%s\\n' {marker} >&2\n".encode(),
+            )
+            try:
+                stdout, stderr = self._read_until(marker.encode(), cmd, timeout)
+            except (TimeoutError, EOFError):
+                self.close()
+                raise
+            return CommandResult(self.ssh.host, cmd, stdout.strip(), stderr.strip(), self.exit_status, time.perf_counter() - start)
 
-            self.exit_status = stdout.channel.recv_exit_status()
-            if self.exit_status == 0:
-                break
+    def run(self, cmd: str, timeout: int = 60, return_err: bool = False) -> str:
+        """Run a command in the shell and return the output.
 
-            time.sleep(1)
+        Args:
+            cmd (str): The command to execute in the shell.
+            timeout (int, optional): Seconds without any output before giving up. Defaults to 60.
+            return_err (bool, optional): If True, return stderr output. Defaults to False.
+
+        Returns:
+            stdout_or_stderr (str): The command output (stdout or stderr).
+        """
+        result = self.execute(cmd, timeout=timeout)
 
         # returns stderr if exit status is not equal to 0
-        if self.exit_status != 0:
-            ret = ret_err
+        if return_err or self.exit_status != 0:
+            return result.stderr
+
+        return result.stdout
+
+    def _read_until(self, marker: bytes, cmd: str, timeout: float) -> tuple[str, str]:
+        """Read stdout and stderr up to the markers of a command and store its exit status."""
+        stdout = bytearray()
+        stderr = bytearray()
+        stdout_end = stderr_end = -1
+        last_output = time.monotonic()
+        while stdout_end < 0 or stderr_end < 0:
+            ready = False
+            if self._channel.recv_ready():
+                ready = True
+                stdout += self._channel.recv(32768)
+            if self._channel.recv_stderr_ready():
+                ready = True
+                stderr += self._channel.recv_stderr(32768)
+
+            if stdout_end < 0:
+                stdout_end = stdout.find(b"\n" + marker + b" ")
+            if stderr_end < 0:
+                stderr_end = stderr.find(b"\n" + marker + b"\n")
+            if ready:
+                last_output = time.monotonic()
+            elif (self._channel.eof_received or self._channel.closed) and not (self._channel.recv_ready() or self._channel.recv_stderr_ready()):
+                # output that arrived between the ready checks and the EOF check is still read before giving up
+                raise EOFError(f"Shell exited while running {cmd!r}")
+            else:
+                idle = time.monotonic() - last_output
+                if idle > timeout:
+                    raise TimeoutError(f"No output from {cmd!r} for {timeout} seconds")
+                select.select([self._channel], [], [], min(timeout - idle, 1.0))
+
+        while not stdout.endswith(b"\n"):
+            # the status line may arrive split across packets
+            stdout += self._channel.recv(32768)
+        self.exit_status = int(stdout[stdout_end + len(marker) + 2 :])
+        return stdout[:stdout_end].decode("utf-8", errors="ignore"), stderr[:stderr_end].decode("utf-8", errors="ignore")
+
+
+class AsyncSSHClient:
+    """Asyncio SSH client built around SSHClient.
+
+    The blocking steps, the handshake and opening a channel, run on a thread pool shared by all
+    instances. Command output is read by polling the non-blocking channel from the event loop, backing
+    off while it is idle, so one event loop can drive thousands of sessions without a thread per host.
+    Concurrent commands share the connection: at most max_channels channels are open at the same time,
+    since SSH servers limit sessions per connection (MaxSessions is 10 by default in OpenSSH), and a
+    dropped connection is reopened once for all the commands that failed on it.
+
+    Attributes:
+        ssh (SSHClient): The synchronous client holding the connection parameters and the connection.
+    """
+
+    _executor = concurrent.futures.ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix="ssh")
+
+    def __init__(self, host: str, username: str, password: str, port: int = 22, pool: SSHConnectionPool | None = None, max_channels: int = 10) -> None:
+        """Initialize AsyncSSHClient instance."""
+        self.ssh = SSHClient(host, username, password, port=port, pool=pool)
+        self._channels = asyncio.Semaphore(max_channels)
+        self._reconnect_lock = asyncio.Lock()
+
+    @property
+    def exit_status(self) -> int | None:
+        """Get the previous exit status of run method.
+
+        Returns:
+            exit_status (int | None): The exit status.
+        """
+        return self.ssh.exit_status
+
+    async def _to_thread(self, fn: Callable, *args: object) -> object:
+        """Run a blocking function on the shared thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def connect(self) -> None:
+        """Connect to the SSH server."""
+        await self._to_thread(self.ssh.connect)
+
+    async def close(self) -> None:
+        """Close the SSH connection."""
+        await self._to_thread(self.ssh.close)
+
+    async def __aenter__(self) -> "AsyncSSHClient":
+        """Connect to the SSH server when entering the context."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Close the SSH connection when leaving the context."""
+        await self.close()
+
+    async def _reconnect(self) -> None:
+        """Reopen the connection if it dropped, skipped if another command already reopened it."""
+        async with self._reconnect_lock:
+            if not self.ssh.is_active():
+                await self.close()
+                await self.connect()
+
+    async def _open_channel(self, cmd: str) -> paramiko.Channel:
+        """Open a channel and start a command on it, waiting for a reconnect in progress."""
+        async with self._reconnect_lock:
+            transport = self.ssh.client.get_transport()
+
+        def open_channel() -> paramiko.Channel:
+            channel = transport.open_session()
+            channel.exec_command(cmd)
+            return channel
+
+        return await self._to_thread(open_channel)
+
+    async def stream(
+        self,
+        cmd: str,
+        timeout: int = 60,
+        lines: bool = True,
+        chunk_size: int = 32768,
+        max_bytes: int | None = None,
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Run a command on the SSH server and yield its output while it runs, see SSHClient.stream.
+
+        Args:
+            cmd (str): The command to execute on the server.
+            timeout (int, optional): Seconds without any output before giving up. Defaults to 60.
+            lines (bool, optional): If True, yield complete lines without the newline, else yield decoded chunks. Defaults to True.
+            chunk_size (int, optional): Maximum bytes read from a stream at once. Defaults to 32768.
+            max_bytes (int | None, optional): Stop after this many bytes of output and close the channel, leaving exit_status None. Defaults to None.
+
+        Yields:
+            output (tuple[str, str]): The stream name, "stdout" or "stderr", and a line or chunk of its output.
+
+        Raises:
+            TimeoutError: If the command produces no output and does not finish within timeout seconds.
+        """
+        self.ssh.exit_status = None
+        decoder = _OutputDecoder(lines, max_bytes)
+        async with self._channels:
+            channel = await self._open_channel(cmd)
+            try:
+                async for name, data in self._recv_chunks(channel, cmd, timeout, chunk_size):
+                    for output in decoder.decode(name, data):
+                        yield output
+                    if decoder.truncated:
+                        return
+                for output in decoder.flush():
+                    yield output
+                while not channel.exit_status_ready():
+                    await asyncio.sleep(ASYNC_POLL_MIN_INTERVAL)
+                self.ssh.exit_status = channel.recv_exit_status()
+            finally:
+                channel.close()
+
+    @staticmethod
+    async def _recv_chunks(channel: paramiko.Channel, cmd: str, timeout: float, chunk_size: int) -> AsyncIterator[tuple[str, bytes]]:
+        """Yield the raw stdout and stderr chunks of a channel as either becomes ready, until EOF, without blocking the event loop."""
+        last_output = time.monotonic()
+        interval = ASYNC_POLL_MIN_INTERVAL
+        while True:
+            ready = False
+            if channel.recv_ready():
+                ready = True
+                yield "stdout", channel.recv(chunk_size)
+            if channel.recv_stderr_ready():
+                ready = True
+                yield "stderr", channel.recv_stderr(chunk_size)
+
+            if ready:
+                last_output = time.monotonic()
+                interval = ASYNC_POLL_MIN_INTERVAL
+            elif channel.eof_received or channel.closed:
+                # output that arrived between the ready checks and the EOF check is still buffered
+                if not (channel.recv_ready() or channel.recv_stderr_ready()):
+                    return
+            elif time.monotonic() - last_output > timeout:
+                raise TimeoutError(f"No output from {cmd!r} for {timeout} seconds")
+            else:
+                # back off while the channel is idle, so idle sessions cost little CPU
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, ASYNC_POLL_MAX_INTERVAL)
+
+    async def _execute_once(self, cmd: str, timeout: int) -> CommandResult:
+        """Run a command once and collect both outputs."""
+        start = time.perf_counter()
+        outputs = {"stdout": [], "stderr": []}
+        async for name, text in self.stream(cmd, timeout=timeout, lines=False):
+            outputs[name].append(text)
+        ret = "".join(outputs["stdout"])
+        ret_err = "".join(outputs["stderr"])
+        return CommandResult(self.ssh.host, cmd, ret.strip(), ret_err.strip(), self.exit_status, time.perf_counter() - start)
+
+    async def execute(self, cmd: str, timeout: int = 60, retry_policy: RetryPolicy | None = None, display: str | None = None) -> CommandResult:
+        """Run a command on the SSH server and return both outputs and the exit status, see SSHClient.execute.
+
+        Concurrent commands on the client wait for a free channel, and a connection that dropped
+        under several of them is reopened only once.
+
+        Args:
+            cmd (str): The command to execute on the server.
+            timeout (int, optional): Seconds without any output before giving up. Defaults to 60.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to None for a single attempt.
+            display (str | None, optional): The command shown in telemetry, such as with passwords masked. Defaults to cmd.
+
+        Returns:
+            result (CommandResult): The stripped stdout and stderr and exit status of the last attempt, and the duration of all attempts.
+        """
+        policy = retry_policy or RetryPolicy(max_attempts=1)
+        start = time.monotonic()
+        attempt = 0
+        reconnect = False
+        with telemetry.track(display or cmd, self.ssh.host) as call:
+            while True:
+                attempt += 1
+                call.attempts = attempt
+                try:
+                    if reconnect:
+                        await self._reconnect()
+                        reconnect = False
+                    result = await self._execute_once(cmd, timeout)
+                # evaluated once raised, so connection errors are only retried while reconnecting, not a command timeout
+                except policy.retryable(SSH_RECONNECT_EXCEPTIONS if reconnect else SSH_TRANSIENT_EXCEPTIONS):
+                    if not policy.should_retry(attempt, time.monotonic() - start):
+                        raise
+                    reconnect = not self.ssh.is_active()
+                    delay = policy.delay(attempt)
+                    call.retry_wait += delay
+                    await asyncio.sleep(delay)
+                    continue
+
+                # the result keeps the exit status of this command, exit_status of the client is shared by concurrent commands
+                if result.exit_status == 0 or not policy.should_retry(attempt, time.monotonic() - start, result.exit_status):
+                    break
+                delay = policy.delay(attempt)
+                call.retry_wait += delay
+                await asyncio.sleep(delay)
+            call.set_output(result.exit_status, result.stdout, result.stderr)
+        result.duration = time.monotonic() - start
+        return result
+
+    async def run(
+        self,
+        cmd: str,
+        timeout: int = 60,
+        retry: int = 3,
+        return_err: bool = False,
+        retry_policy: RetryPolicy | None = None,
+        display: str | None = None,
+    ) -> str:
+        """Run a command on the SSH server and return the output, see SSHClient.run.
 
-        if return_err:
-            return ret_err.strip()
+        Args:
+            cmd (str): The command to execute on the server.
+            timeout (int, optional): Seconds without any output before giving up. Defaults to 60.
+            retry (int, optional): Number of attempts if command fails, ignored if retry_policy is set. Defaults to 3.
+            return_err (bool, optional): If True, return stderr output. Defaults to False.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to RetryPolicy(max_attempts=retry).
+            display (str | None, optional): The command shown in telemetry, such as with passwords masked. Defaults to cmd.
+
+        Returns:
+            stdout_or_stderr (str): The command output (stdout or stderr).
+        """
+        result = await self.execute(cmd, timeout=timeout, retry_policy=retry_policy or RetryPolicy(max_attempts=retry), display=display)
+
+        # returns stderr if exit status is not equal to 0
+        if return_err or result.exit_status != 0:
+            return result.stderr
 
-        return ret.strip()
+        return result.stdout
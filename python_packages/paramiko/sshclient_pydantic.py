@@ -7,6 +7,7 @@ executing commands, and managing connection parameters using paramiko.
 import atexit
 import time
 from ipaddress import IPv4Address
+from typing import Any, ClassVar
 
 import paramiko
 from pydantic import BaseModel, ConfigDict, Field, InstanceOf, field_validator
@@ -25,6 +26,7 @@ class SSHClient(BaseModel):
         password (str): The SSH password.
         client (paramiko.SSHClient): The paramiko SSH client instance.
         exit_status (int | None): Previous exit status of run method. Defaults to None.
+        validate_once (bool): Assign the hot-path fields exit_status and client without validation after construction. Defaults to False.
     """
 
     model_config = ConfigDict(
@@ -38,6 +40,10 @@ class SSHClient(BaseModel):
     password: str
     client: InstanceOf[paramiko.SSHClient] = Field(default_factory=paramiko.SSHClient)
     exit_status: int | None = Field(default=None, description="Previous exit status of run method")
+    validate_once: bool = Field(default=False, description="Assign the hot-path fields exit_status and client without validation after construction")
+
+    # fields written by the client itself, so their values are known to be valid
+    _unvalidated_fields: ClassVar[frozenset[str]] = frozenset({"exit_status", "client"})
 
     @field_validator("host")
     @classmethod
@@ -46,6 +52,19 @@ class SSHClient(BaseModel):
         IPv4Address(value)
         return value
 
+    def __setattr__(self, name: str, value: Any) -> None:  # noqa: ANN401
+        """Set an attribute, skipping assignment validation of the hot-path fields if validate_once is set.
+
+        run writes exit_status after every command, so with validate_assignment each run pays a
+        validation of the assignment. With validate_once the value is stored directly, as it comes from paramiko.
+        Assignments of the connection parameters are still validated.
+        """
+        if self.validate_once and name in self._unvalidated_fields:
+            self.__dict__[name] = value
+            self.__pydantic_fields_set__.add(name)
+            return
+        super().__setattr__(name, value)
+
     def connect(self) -> None:
         """Connect to the SSH server.
 
@@ -1,18 +1,54 @@
 """Module for managing subprocess execution and network drive mounting.
 
 Provides:
-- Subproc: Utility for running shell commands with retry and error handling.
+- RetryPolicy: Retry policy with exponential backoff and jitter, shared with the SSH client from command_exec.retry.
+- CommandTemplate: A command parsed once into an argv list with named placeholders.
+- Command, CommandResult: A command of a batch and its outcome.
+- OutputStream, AsyncOutputStream: The output of a running command, read with bounded memory.
+- telemetry: Records of each executed command, shared with the SSH client from command_exec.telemetry.
+- Subproc: Utility for running shell commands with retry and error handling, alone or as a batch.
 - Mount: Class for mounting network drives and transferring files via SCP.
+
+The shared command_exec package is imported from python_packages, which has to be on the import path:
+
+    PYTHONPATH=python_packages python python_packages/subprocess/subproc.py
 """
 
+import asyncio
 import atexit
+import codecs
+import concurrent.futures
+import contextlib
+import functools
+import locale
+import os
+import queue
 import re
 import shlex
+import signal
+import string
 import subprocess
+import threading
 import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
 from datetime import datetime
 from ipaddress import IPv4Address
 
+from command_exec.retry import RetryPolicy
+from command_exec.telemetry import telemetry
+
+STREAM_CHUNK_SIZE = 65536  # maximum bytes read from a pipe at once
+STREAM_QUEUE_SIZE = 64  # chunks buffered between the pipe readers and the consumer
+STREAM_TAIL_LINES = 100  # lines of each stream kept for error reporting
+STREAM_TAIL_BYTES = 65536  # bytes of each stream kept for error reporting when streaming raw chunks
+STREAM_MAX_LINE = 65536  # characters buffered for a line without a newline before it is yielded in parts
+COMMAND_CACHE_SIZE = 256  # parsed commands and templates kept by the parse caches
+SECRET_FIELDS = frozenset({"password", "passwd", "secret", "token"})  # template fields masked by CommandTemplate.display
+REDACTED = "***"  # shown instead of a secret
+TRANSIENT_EXCEPTIONS = (BlockingIOError, InterruptedError)  # retried unless the RetryPolicy sets retryable_exceptions
+
 
 def pt(
     msg: str,
@@ -38,25 +74,523 @@ def pt(
     print(f"{msg}", flush=True)
 
 
+class CommandTemplate:
+    """Command parsed once into an argv list with named placeholders.
+
+    Placeholders use the str.format syntax within an argument, such as "cmdkey /add:{host}", and
+    literal braces are doubled. A substituted value always stays within its argument whatever spaces
+    or quotes it contains, so the rendered command runs without a shell. Parsed templates are cached,
+    so creating the same template in a loop does not tokenize it again.
+
+    Attributes:
+        template (str): The template.
+        fields (frozenset[str]): The placeholder names.
+        secret_fields (frozenset[str]): The placeholder names whose values are masked by display.
+    """
+
+    def __init__(self, template: str, secret_fields: Iterable[str] = SECRET_FIELDS) -> None:
+        """Initialize CommandTemplate.
+
+        Args:
+            template (str): The template, split into arguments like shlex.split.
+            secret_fields (Iterable[str], optional): The placeholder names whose values are masked by display. Defaults to SECRET_FIELDS.
+        """
+        self.template = template
+        self.secret_fields = frozenset(secret_fields)
+        self._tokens = _parse_template(template)
+        self.fields = frozenset(name for _, names in self._tokens for name in names)
+
+    def render(self, **values: object) -> list[str]:
+        """Substitute the placeholders.
+
+        Args:
+            **values (object): The value of each placeholder.
+
+        Returns:
+            argv (list[str]): The command as an argv list, to pass to Subproc.run.
+
+        Raises:
+            KeyError: If a placeholder has no value.
+        """
+        return [token.format_map(values) if names else token for token, names in self._tokens]
+
+    def display(self, **values: object) -> str:
+        """Substitute the placeholders into a command line for telemetry and messages, masking secret fields.
+
+        Args:
+            **values (object): The value of each placeholder.
+
+        Returns:
+            cmd (str): The command line with the value of each secret field replaced by "***".
+
+        Raises:
+            KeyError: If a placeholder has no value.
+        """
+        masked = {name: REDACTED if name in self.secret_fields else value for name, value in values.items()}
+        return shlex.join(self.render(**masked))
+
+
+@dataclass(frozen=True)
+class Command:
+    """A command of a batch run by Subproc.run_batch.
+
+    Attributes:
+        name (str): The unique name of the command in the batch.
+        cmd (str | list[str]): The command to execute, or its argv list.
+        deps (tuple[str, ...]): Names of the commands that must succeed before this one starts. Defaults to ().
+        timeout (int): Timeout in seconds. Defaults to 600.
+        shell (bool): Whether to run the command in a shell. Defaults to False.
+        retry_policy (RetryPolicy | None): The retry policy. Defaults to None for a single attempt.
+    """
+
+    name: str
+    cmd: str | list[str]
+    deps: tuple[str, ...] = ()
+    timeout: int = 600
+    shell: bool = False
+    retry_policy: RetryPolicy | None = None
+
+
+@dataclass
+class CommandResult:
+    """Result of a command.
+
+    Attributes:
+        name (str): The command name, the command itself if it was run outside a batch.
+        cmd (str | list[str]): The command, or its argv list.
+        returncode (int | None): The exit status, None if the command did not complete.
+        stdout (str): The standard output.
+        stderr (str): The standard error.
+        duration (float): Seconds spent on the command, including retries.
+        attempts (int): Number of attempts. Defaults to 1.
+        error (str | None): Why the command did not complete, such as a timeout or a failed dependency. Defaults to None.
+    """
+
+    name: str
+    cmd: str | list[str]
+    returncode: int | None
+    stdout: str
+    stderr: str
+    duration: float
+    attempts: int = 1
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Check whether the command completed with exit status 0.
+
+        Returns:
+            ok (bool): True if the command succeeded.
+        """
+        return self.error is None and self.returncode == 0
+
+
+class _OutputDecoder:
+    """Split the stdout and stderr chunks of a command into lines, keeping the last lines of each stream.
+
+    Memory stays bounded whatever the output: a line without a newline, such as a progress bar
+    redrawn with carriage returns, is yielded in parts of STREAM_MAX_LINE characters, and raw
+    chunks are not split at all, only their last STREAM_TAIL_BYTES bytes are kept for the tail.
+    """
+
+    def __init__(self, lines: bool, tail_lines: int) -> None:
+        """Initialize _OutputDecoder instance."""
+        self.lines = lines
+        self.tail = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+        self._decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in self.tail}
+        # the pieces of the unfinished line, joined once it ends, so a long line is not copied on every chunk
+        self._pending: dict[str, list[str]] = {name: [] for name in self.tail}
+        self._pending_size = dict.fromkeys(self.tail, 0)
+        self._raw_tail = {name: bytearray() for name in self.tail}
+
+    def decode(self, name: str, data: bytes, final: bool) -> list[tuple[str, str | bytes]]:
+        """Split a chunk into lines, keeping the tail, and return the outputs it yields."""
+        if not self.lines:
+            self._keep_raw_tail(name, data, final)
+            return [(name, data)] if data else []
+
+        pending = self._pending[name]
+        first, *rest = self._decoders[name].decode(data, final=final).split("\n")
+        pending.append(first)
+        self._pending_size[name] += len(first)
+        complete = []
+        if rest:
+            *middle, last = rest
+            complete = [line.removesuffix("\r") for line in ("".join(pending), *middle)]
+            pending[:] = [last]
+            self._pending_size[name] = len(last)
+        if final or self._pending_size[name] >= STREAM_MAX_LINE:
+            part = "".join(pending)
+            pending.clear()
+            self._pending_size[name] = 0
+            if part:
+                # a part of a longer line keeps its carriage returns, only the end of the output is a line end
+                complete.append(part.removesuffix("\r") if final else part)
+        self.tail[name].extend(complete)
+        return [(name, line) for line in complete]
+
+    def _keep_raw_tail(self, name: str, data: bytes, final: bool) -> None:
+        """Keep the last bytes of a raw stream, split into the tail lines at EOF."""
+        raw_tail = self._raw_tail[name]
+        raw_tail += data
+        del raw_tail[:-STREAM_TAIL_BYTES]
+        if final:
+            text = raw_tail.decode("utf-8", errors="replace").removesuffix("\n")
+            self.tail[name].extend(line.removesuffix("\r") for line in text.split("\n") if text)
+
+
+class OutputStream:
+    """Output of a running command, read from both pipes concurrently with bounded memory.
+
+    A reader thread per pipe moves chunks to a bounded queue, so a command filling one pipe
+    cannot block on the other and a slow consumer holds the command back instead of piling
+    up output. Only the last lines of each stream are kept, for error reporting.
+
+    Iterate over the stream to get ("stdout" | "stderr", output) pairs, or call wait with a callback.
+
+    Attributes:
+        cmd (str | list[str]): The command, or its argv list.
+        returncode (int | None): The exit status once the output is consumed.
+        tail (dict[str, deque[str]]): The last lines of stdout and stderr.
+    """
+
+    def __init__(
+        self,
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        lines: bool = True,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        tee: str | None = None,
+        tail_lines: int = STREAM_TAIL_LINES,
+        check: bool = True,
+    ) -> None:
+        """Initialize OutputStream, the command starts on iteration."""
+        self.cmd = cmd
+        self.timeout = timeout
+        self.shell = shell
+        self.chunk_size = chunk_size
+        self.tee = tee
+        self.check = check
+        self.returncode = None
+        self._decoder = _OutputDecoder(lines, tail_lines)
+        self.tail = self._decoder.tail
+
+    def __iter__(self) -> Iterator[tuple[str, str | bytes]]:
+        """Run the command and yield its output while it runs.
+
+        Yields:
+            output (tuple[str, str | bytes]): The stream name and a line without the newline, or a raw chunk if lines is False.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command does not finish within timeout seconds, its process group is killed.
+            RuntimeError: If the command fails and check is True, with the tail of stderr as message.
+        """
+        deadline = time.monotonic() + self.timeout
+        outputs = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        # open the tee file first, so a bad path fails before the command and the readers start
+        with open(self.tee, "wb") if self.tee else contextlib.nullcontext() as tee_file:
+            # a process group of its own, so a timeout also kills the processes it started, which may hold the pipes
+            process = subprocess.Popen(_args(self.cmd, self.shell), stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=self.shell, start_new_session=True)
+            readers = [threading.Thread(target=self._read_pipe, args=(name, pipe, outputs), daemon=True) for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))]
+            for reader in readers:
+                reader.start()
+            open_pipes = len(readers)
+            try:
+                while open_pipes:
+                    try:
+                        name, data = outputs.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        raise subprocess.TimeoutExpired(self.cmd, self.timeout) from None
+                    if data is None:
+                        open_pipes -= 1
+                        data = b""
+                    if tee_file:
+                        tee_file.write(data)
+                    yield from self._decoder.decode(name, data, final=not data)
+                self.returncode = process.wait(timeout=max(deadline - time.monotonic(), 0))
+            finally:
+                self._stop(process, readers, outputs, finished=self.returncode is not None)
+
+        if self.check and self.returncode != 0:
+            pt(f"Failed to run command: {_command_line(self.cmd)}", is_ansicolor=True)
+            raise RuntimeError("\n".join(self.tail["stderr"]))
+
+    def wait(self, callback: Callable[[str, str | bytes], None] | None = None) -> int:
+        """Run the command to completion, passing each output to a callback.
+
+        Args:
+            callback (Callable[[str, str | bytes], None] | None, optional): Called with the stream name and each output. Defaults to None to discard the output.
+
+        Returns:
+            returncode (int): The exit status.
+        """
+        for name, output in self:
+            if callback:
+                callback(name, output)
+        return self.returncode
+
+    @staticmethod
+    def _stop(process: subprocess.Popen, readers: list[threading.Thread], outputs: queue.Queue, finished: bool) -> None:
+        """Kill the process group of the command unless it finished and wait for it and the pipe readers."""
+        if not finished:
+            _kill_popen_group(process)
+        # unblock the readers waiting on a full queue so they see EOF and exit
+        while any(reader.is_alive() for reader in readers):
+            with contextlib.suppress(queue.Empty):
+                outputs.get(timeout=0.1)
+        process.wait()
+
+    def _read_pipe(self, name: str, pipe: object, outputs: queue.Queue) -> None:
+        """Move the chunks of a pipe to the queue, then None at EOF."""
+        with pipe:
+            while data := pipe.read1(self.chunk_size):
+                outputs.put((name, data))
+        outputs.put((name, None))
+
+
+class AsyncOutputStream:
+    """Output of a running command read from the event loop, see OutputStream.
+
+    The pipes are read by tasks instead of threads, so many commands can be streamed from one event loop.
+
+    Attributes:
+        cmd (str | list[str]): The command, or its argv list.
+        returncode (int | None): The exit status once the output is consumed.
+        tail (dict[str, deque[str]]): The last lines of stdout and stderr.
+    """
+
+    def __init__(
+        self,
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        lines: bool = True,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        tail_lines: int = STREAM_TAIL_LINES,
+        check: bool = True,
+    ) -> None:
+        """Initialize AsyncOutputStream, the command starts on iteration."""
+        self.cmd = cmd
+        self.timeout = timeout
+        self.shell = shell
+        self.chunk_size = chunk_size
+        self.check = check
+        self.returncode = None
+        self._decoder = _OutputDecoder(lines, tail_lines)
+        self.tail = self._decoder.tail
+
+    async def __aiter__(self) -> AsyncIterator[tuple[str, str | bytes]]:
+        """Run the command and yield its output while it runs.
+
+        Yields:
+            output (tuple[str, str | bytes]): The stream name and a line without the newline, or a raw chunk if lines is False.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command does not finish within timeout seconds, its process group is killed.
+            RuntimeError: If the command fails and check is True, with the tail of stderr as message.
+        """
+        deadline = time.monotonic() + self.timeout
+        outputs = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        process = await _create_process(self.cmd, self.shell)
+        readers = [asyncio.create_task(self._read_pipe(name, pipe, outputs)) for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))]
+        open_pipes = len(readers)
+        try:
+            while open_pipes:
+                try:
+                    name, data = await asyncio.wait_for(outputs.get(), max(deadline - time.monotonic(), 0))
+                except TimeoutError:
+                    raise subprocess.TimeoutExpired(self.cmd, self.timeout) from None
+                if not data:
+                    open_pipes -= 1
+                for output in self._decoder.decode(name, data, final=not data):
+                    yield output
+            self.returncode = await process.wait()
+        finally:
+            for reader in readers:
+                reader.cancel()
+            await _kill_process_group(process)
+
+        if self.check and self.returncode != 0:
+            pt(f"Failed to run command: {_command_line(self.cmd)}", is_ansicolor=True)
+            raise RuntimeError("\n".join(self.tail["stderr"]))
+
+    async def wait(self, callback: Callable[[str, str | bytes], None] | None = None) -> int:
+        """Run the command to completion, passing each output to a callback.
+
+        Args:
+            callback (Callable[[str, str | bytes], None] | None, optional): Called with the stream name and each output. Defaults to None to discard the output.
+
+        Returns:
+            returncode (int): The exit status.
+        """
+        async for name, output in self:
+            if callback:
+                callback(name, output)
+        return self.returncode
+
+    async def _read_pipe(self, name: str, pipe: asyncio.StreamReader, outputs: asyncio.Queue) -> None:
+        """Move the chunks of a pipe to the queue, then an empty chunk at EOF."""
+        while data := await pipe.read(self.chunk_size):
+            await outputs.put((name, data))
+        await outputs.put((name, b""))
+
+
 class Subproc:
     """Run a command in a subprocess."""
 
     @staticmethod
     def run(
-        cmd: str,
+        cmd: str | list[str],
         timeout: int = 600,
         shell: bool = False,
         check: bool = True,
         retry: int = 3,
+        retry_policy: RetryPolicy | None = None,
+        display: str | None = None,
     ) -> str:
         """Run the command in a subprocess and return the output.
 
+        If check is True, failed attempts are retried with exponential backoff.
+
+        Args:
+            cmd (str | list[str]): The command to execute, or its argv list.
+            timeout (int, optional): Timeout in seconds. Defaults to 600.
+            shell (bool, optional): Whether to run the command in a shell. Defaults to False.
+            check (bool, optional): Raise error if command fails. Defaults to True.
+            retry (int, optional): Number of attempts if command fails, ignored if retry_policy is set. Defaults to 3.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to RetryPolicy(max_attempts=retry).
+            display (str | None, optional): The command line shown in telemetry and messages, such as with passwords masked. Defaults to the command line.
+
+        Returns:
+            stdout_or_stderr (str): The command output (stdout or stderr).
+
+        Raises:
+            RuntimeError: If the command fails and check is True.
+        """
+        result = Subproc.execute(cmd, timeout=timeout, shell=shell, retry_policy=retry_policy or RetryPolicy(max_attempts=retry), retry_failures=check, display=display)
+
+        if check and result.returncode != 0:
+            pt(f"Failed to run command: {display or _command_line(cmd)}", is_ansicolor=True)
+            raise RuntimeError(result.stderr)
+
+        if result.returncode != 0:
+            return result.stderr
+        return result.stdout
+
+    @staticmethod
+    def execute(
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        retry_policy: RetryPolicy | None = None,
+        retry_failures: bool = True,
+        name: str | None = None,
+        display: str | None = None,
+    ) -> CommandResult:
+        """Run the command in a subprocess and return both outputs and the exit status.
+
+        The call is recorded by the telemetry shared with the SSH client, see command_exec.telemetry.
+
         Args:
-            cmd (str): The command to execute.
+            cmd (str | list[str]): The command to execute, or its argv list.
             timeout (int, optional): Timeout in seconds. Defaults to 600.
             shell (bool, optional): Whether to run the command in a shell. Defaults to False.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to None for a single attempt.
+            retry_failures (bool, optional): Retry a non-zero exit status, else only retryable exceptions. Defaults to True.
+            name (str | None, optional): The name of the result. Defaults to display.
+            display (str | None, optional): The command line shown in telemetry, such as with passwords masked. Defaults to the command line.
+
+        Returns:
+            result (CommandResult): The outputs, exit status, duration and number of attempts.
+
+        Raises:
+            subprocess.TimeoutExpired: If an attempt times out.
+        """
+        policy = retry_policy or RetryPolicy(max_attempts=1)
+        args = _args(cmd, shell)
+        start = time.monotonic()
+        attempt = 0
+        display = display or _command_line(cmd)
+        with telemetry.track(display) as call:
+            while True:
+                attempt += 1
+                call.attempts = attempt
+                try:
+                    result = subprocess.run(
+                        args,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        timeout=timeout,
+                        shell=shell,
+                    )
+                except policy.retryable(TRANSIENT_EXCEPTIONS):
+                    if not policy.should_retry(attempt, time.monotonic() - start):
+                        raise
+                    delay = policy.delay(attempt)
+                    call.retry_wait += delay
+                    time.sleep(delay)
+                    continue
+
+                if not retry_failures or result.returncode == 0 or not policy.should_retry(attempt, time.monotonic() - start, result.returncode):
+                    break
+
+                delay = policy.delay(attempt)
+                call.retry_wait += delay
+                time.sleep(delay)
+            call.set_output(result.returncode, result.stdout, result.stderr)
+
+        return CommandResult(name or display, cmd, result.returncode, result.stdout, result.stderr, time.monotonic() - start, attempt)
+
+    @staticmethod
+    def stream(
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        lines: bool = True,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        tee: str | None = None,
+        tail_lines: int = STREAM_TAIL_LINES,
+        check: bool = True,
+    ) -> OutputStream:
+        """Run the command in a subprocess, streaming its output instead of capturing it.
+
+        Args:
+            cmd (str | list[str]): The command to execute, or its argv list.
+            timeout (int, optional): Timeout in seconds. Defaults to 600.
+            shell (bool, optional): Whether to run the command in a shell. Defaults to False.
+            lines (bool, optional): If True, yield decoded lines without the newline, else raw byte chunks. Defaults to True.
+            chunk_size (int, optional): Maximum bytes read from a pipe at once. Defaults to 65536.
+            tee (str | None, optional): File to write the raw output of both streams to as it arrives. Defaults to None.
+            tail_lines (int, optional): Number of last lines of each stream kept for error reporting. Defaults to 100.
             check (bool, optional): Raise error if command fails. Defaults to True.
-            retry (int, optional): Number of retries if command fails. Defaults to 3.
+
+        Returns:
+            stream (OutputStream): The output, the command starts when it is iterated or waited on.
+        """
+        return OutputStream(cmd, timeout=timeout, shell=shell, lines=lines, chunk_size=chunk_size, tee=tee, tail_lines=tail_lines, check=check)
+
+    @staticmethod
+    async def arun(
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        check: bool = True,
+        retry: int = 3,
+        retry_policy: RetryPolicy | None = None,
+        display: str | None = None,
+    ) -> str:
+        """Run the command in a subprocess from the event loop and return the output, see run.
+
+        Args:
+            cmd (str | list[str]): The command to execute, or its argv list.
+            timeout (int, optional): Timeout in seconds. Defaults to 600.
+            shell (bool, optional): Whether to run the command in a shell. Defaults to False.
+            check (bool, optional): Raise error if command fails. Defaults to True.
+            retry (int, optional): Number of attempts if command fails, ignored if retry_policy is set. Defaults to 3.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to RetryPolicy(max_attempts=retry).
+            display (str | None, optional): The command line shown in telemetry and messages, such as with passwords masked. Defaults to the command line.
 
         Returns:
             stdout_or_stderr (str): The command output (stdout or stderr).
@@ -64,40 +598,268 @@ class Subproc:
         Raises:
             RuntimeError: If the command fails and check is True.
         """
-        for _ in range(retry):
-            if shell:
-                result = subprocess.run(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=timeout,
-                    shell=shell,
-                )
-            else:
-                result = subprocess.run(
-                    shlex.split(cmd),
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=timeout,
-                    shell=shell,
-                )
-            # pt(f"{result.returncode=}, {cmd=}")
-
-            if not check or result.returncode == 0:
-                break
-
-            time.sleep(1)
+        result = await Subproc.aexecute(cmd, timeout=timeout, shell=shell, retry_policy=retry_policy or RetryPolicy(max_attempts=retry), retry_failures=check, display=display)
 
         if check and result.returncode != 0:
-            pt(f"Failed to run command: {cmd}", is_ansicolor=True)
+            pt(f"Failed to run command: {display or _command_line(cmd)}", is_ansicolor=True)
             raise RuntimeError(result.stderr)
 
         if result.returncode != 0:
             return result.stderr
         return result.stdout
 
+    @staticmethod
+    async def aexecute(
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        retry_policy: RetryPolicy | None = None,
+        retry_failures: bool = True,
+        name: str | None = None,
+        display: str | None = None,
+    ) -> CommandResult:
+        """Run the command in a subprocess from the event loop and return both outputs and the exit status, see execute.
+
+        The command runs in its own process group, which is killed as a whole on timeout or cancellation.
+        The call is recorded by the telemetry shared with the SSH client, see command_exec.telemetry.
+
+        Args:
+            cmd (str | list[str]): The command to execute, or its argv list.
+            timeout (int, optional): Timeout in seconds. Defaults to 600.
+            shell (bool, optional): Whether to run the command in a shell. Defaults to False.
+            retry_policy (RetryPolicy | None, optional): The retry policy. Defaults to None for a single attempt.
+            retry_failures (bool, optional): Retry a non-zero exit status, else only retryable exceptions. Defaults to True.
+            name (str | None, optional): The name of the result. Defaults to display.
+            display (str | None, optional): The command line shown in telemetry, such as with passwords masked. Defaults to the command line.
+
+        Returns:
+            result (CommandResult): The outputs, exit status, duration and number of attempts.
+
+        Raises:
+            subprocess.TimeoutExpired: If an attempt times out.
+        """
+        policy = retry_policy or RetryPolicy(max_attempts=1)
+        start = time.monotonic()
+        attempt = 0
+        display = display or _command_line(cmd)
+        with telemetry.track(display) as call:
+            while True:
+                attempt += 1
+                call.attempts = attempt
+                try:
+                    returncode, stdout, stderr = await _communicate(cmd, shell, timeout)
+                except policy.retryable(TRANSIENT_EXCEPTIONS):
+                    if not policy.should_retry(attempt, time.monotonic() - start):
+                        raise
+                    delay = policy.delay(attempt)
+                    call.retry_wait += delay
+                    await asyncio.sleep(delay)
+                    continue
+
+                if not retry_failures or returncode == 0 or not policy.should_retry(attempt, time.monotonic() - start, returncode):
+                    break
+
+                delay = policy.delay(attempt)
+                call.retry_wait += delay
+                await asyncio.sleep(delay)
+            call.set_output(returncode, stdout, stderr)
+
+        return CommandResult(name or display, cmd, returncode, stdout, stderr, time.monotonic() - start, attempt)
+
+    @staticmethod
+    def astream(
+        cmd: str | list[str],
+        timeout: int = 600,
+        shell: bool = False,
+        lines: bool = True,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        tail_lines: int = STREAM_TAIL_LINES,
+        check: bool = True,
+    ) -> AsyncOutputStream:
+        """Run the command in a subprocess from the event loop, streaming its output, see stream.
+
+        Args:
+            cmd (str | list[str]): The command to execute, or its argv list.
+            timeout (int, optional): Timeout in seconds. Defaults to 600.
+            shell (bool, optional): Whether to run the command in a shell. Defaults to False.
+            lines (bool, optional): If True, yield decoded lines without the newline, else raw byte chunks. Defaults to True.
+            chunk_size (int, optional): Maximum bytes read from a pipe at once. Defaults to 65536.
+            tail_lines (int, optional): Number of last lines of each stream kept for error reporting. Defaults to 100.
+            check (bool, optional): Raise error if command fails. Defaults to True.
+
+        Returns:
+            stream (AsyncOutputStream): The output, the command starts when it is iterated or waited on.
+        """
+        return AsyncOutputStream(cmd, timeout=timeout, shell=shell, lines=lines, chunk_size=chunk_size, tail_lines=tail_lines, check=check)
+
+    @staticmethod
+    def run_batch(commands: Iterable[Command], max_workers: int | None = None) -> Iterator[CommandResult]:
+        """Run a batch of commands concurrently and yield the results as they complete.
+
+        A command starts once all of its dependencies succeeded, so the batch forms a DAG.
+        Independent commands run at the same time, up to max_workers. A command whose
+        dependency failed is not run and yields a result with error set, as does a command
+        that timed out or could not be started.
+
+        Args:
+            commands (Iterable[Command]): The commands.
+            max_workers (int | None, optional): Maximum number of commands running at the same time. Defaults to the number of CPUs.
+
+        Yields:
+            result (CommandResult): The result of each command, in completion order.
+
+        Raises:
+            ValueError: If a name is duplicated, a dependency is unknown or the dependencies form a cycle.
+        """
+        by_name = _check_dag(commands)
+        waiting = {name: set(command.deps) for name, command in by_name.items()}
+        dependents = defaultdict(list)
+        for command in by_name.values():
+            for dep in command.deps:
+                dependents[dep].append(command.name)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            running = {}
+            finished = []
+            while True:
+                # start the commands freed by the previous results before handing those results to the caller
+                for name in [name for name, deps in waiting.items() if not deps]:
+                    del waiting[name]
+                    running[executor.submit(_execute_command, by_name[name])] = name
+                yield from finished
+                if not running:
+                    return
+
+                finished = []
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    del running[future]
+                    finished.append(result)
+                    if result.ok:
+                        for dependent in dependents[result.name]:
+                            waiting[dependent].discard(result.name)
+                    else:
+                        finished += _skip_dependents(result.name, by_name, waiting, dependents)
+
+
+def _check_dag(commands: Iterable[Command]) -> dict[str, Command]:
+    """Index the commands of a batch by name and check that their dependencies form a DAG."""
+    by_name = {}
+    for command in commands:
+        if command.name in by_name:
+            raise ValueError(f"Duplicate command name: {command.name}")
+        by_name[command.name] = command
+    for command in by_name.values():
+        unknown = [dep for dep in command.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown dependencies of {command.name}: {', '.join(unknown)}")
+
+    # Kahn's algorithm: the commands left over once no command is free of dependencies form a cycle
+    remaining = {name: set(command.deps) for name, command in by_name.items()}
+    while True:
+        free = {name for name, deps in remaining.items() if not deps}
+        if not free:
+            break
+        for name in free:
+            del remaining[name]
+        for deps in remaining.values():
+            deps -= free
+    if remaining:
+        raise ValueError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+    return by_name
+
+
+def _execute_command(command: Command) -> CommandResult:
+    """Run a command of a batch, turning an error into a result with error set."""
+    start = time.monotonic()
+    try:
+        return Subproc.execute(command.cmd, timeout=command.timeout, shell=command.shell, retry_policy=command.retry_policy, name=command.name)
+    except Exception as e:
+        return CommandResult(command.name, command.cmd, None, "", "", time.monotonic() - start, error=f"{type(e).__name__}: {e}")
+
+
+def _skip_dependents(name: str, by_name: dict[str, Command], waiting: dict[str, set[str]], dependents: dict[str, list[str]]) -> Iterator[CommandResult]:
+    """Drop the commands depending directly or indirectly on a failed command, yielding a skipped result for each."""
+    for dependent in dependents[name]:
+        if dependent in waiting:
+            del waiting[dependent]
+            command = by_name[dependent]
+            yield CommandResult(command.name, command.cmd, None, "", "", 0.0, attempts=0, error=f"Skipped, dependency {name} failed")
+            yield from _skip_dependents(dependent, by_name, waiting, dependents)
+
+
+async def _create_process(cmd: str | list[str], shell: bool) -> asyncio.subprocess.Process:
+    """Start a command in a new process group with stdout and stderr piped."""
+    if shell:
+        return await asyncio.create_subprocess_shell(_args(cmd, shell), stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    return await asyncio.create_subprocess_exec(*_args(cmd, shell), stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+
+def _kill_popen_group(process: subprocess.Popen) -> None:
+    """Kill a command started in a new process group with the processes it started, even if the command itself exited."""
+    if hasattr(os, "killpg"):
+        # the command is not reaped yet, so its pid still names its group
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+    elif process.poll() is None:
+        process.kill()
+
+
+async def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Kill a command that is still running, with the processes it started, and reap it."""
+    if process.returncode is not None:
+        return
+    with contextlib.suppress(ProcessLookupError):
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    await process.wait()
+
+
+async def _communicate(cmd: str | list[str], shell: bool, timeout: float) -> tuple[int, str, str]:
+    """Run a command once and return its exit status and decoded outputs, killing its process group on timeout."""
+    process = await _create_process(cmd, shell)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except TimeoutError:
+        raise subprocess.TimeoutExpired(cmd, timeout) from None
+    finally:
+        await _kill_process_group(process)
+    # decode like subprocess.run with text=True
+    encoding = locale.getpreferredencoding(False)
+    return process.returncode, stdout.decode(encoding).replace("\r\n", "\n"), stderr.decode(encoding).replace("\r\n", "\n")
+
+
+@functools.lru_cache(maxsize=COMMAND_CACHE_SIZE)
+def _split_command(cmd: str) -> tuple[str, ...]:
+    """Split a command like shlex.split, caching the argv of repeated commands."""
+    return tuple(shlex.split(cmd))
+
+
+@functools.lru_cache(maxsize=COMMAND_CACHE_SIZE)
+def _parse_template(template: str) -> tuple[tuple[str, tuple[str, ...]], ...]:
+    """Split a command template into arguments, each with the names of its placeholders."""
+    tokens = []
+    for token in shlex.split(template):
+        names = tuple(name for _, name, _, _ in string.Formatter().parse(token) if name is not None)
+        # an argument without placeholders is rendered once here, which unescapes its doubled braces
+        tokens.append((token if names else token.format(), names))
+    return tuple(tokens)
+
+
+def _args(cmd: str | list[str], shell: bool) -> str | Sequence[str]:
+    """Get the args of subprocess for a command or argv list, a command line if shell is True."""
+    if isinstance(cmd, str):
+        return cmd if shell else _split_command(cmd)
+    return shlex.join(cmd) if shell else cmd
+
+
+def _command_line(cmd: str | list[str]) -> str:
+    """Get the command line of a command or argv list for messages."""
+    return cmd if isinstance(cmd, str) else shlex.join(cmd)
+
 
 class Mount:
     """Add a cmdkey and mount a network drive. Copy files to/from the remote server using SCP.
@@ -110,6 +872,11 @@ class Mount:
         _free_letter (str | None): The first available drive letter.
     """
 
+    _cmdkey_list = CommandTemplate("cmdkey /list {host}")
+    _cmdkey_delete = CommandTemplate("cmdkey /delete:{host}")
+    _cmdkey_add = CommandTemplate("cmdkey /add:{host} /user:{username} /pass:{password}")
+    _cmdkey_generic = CommandTemplate("cmdkey /generic:{host} /user:{username} /pass:{password}")
+
     def __init__(self, host: str, username: str, password: str, port: int = 22) -> None:
         """Initialize Mount object with default values."""
         self._host = host
@@ -222,11 +989,12 @@ class Mount:
 
     def add_cmdkey(self) -> None:
         """Add the cmdkey for Windows credential manager."""
-        shell = " " in self.username or " " in self.password
-        ret = Subproc.run(f'cmdkey /list "{self.host}"', check=False)
-        Subproc.run(f'cmdkey /delete:"{self.host}"', check=False)
-        Subproc.run(f'cmdkey /add:"{self.host}" /user:"{self.username}" /pass:"{self.password}"', shell=shell)
-        Subproc.run(f'cmdkey /generic:"{self.host}" /user:"{self.username}" /pass:"{self.password}"', shell=shell)
+        ret = Subproc.run(self._cmdkey_list.render(host=self.host), check=False)
+        Subproc.run(self._cmdkey_delete.render(host=self.host), check=False)
+        # the credentials stay single arguments without a shell, even if they contain spaces
+        credentials = {"host": self.host, "username": self.username, "password": self.password}
+        Subproc.run(self._cmdkey_add.render(**credentials), display=self._cmdkey_add.display(**credentials))
+        Subproc.run(self._cmdkey_generic.render(**credentials), display=self._cmdkey_generic.display(**credentials))
         pt(f'Add cmdkey "{self.host}" "{self.username}" "{self.password}" successfully')
         if "Generic" in ret and "Domain" in ret:
             return
@@ -234,7 +1002,7 @@ class Mount:
 
     def delete_cmdkey(self) -> None:
         """Delete the cmdkey from Windows credential manager."""
-        Subproc.run(f'cmdkey /delete:"{self.host}"')
+        Subproc.run(self._cmdkey_delete.render(host=self.host))
         pt(f'Delete cmdkey /delete:"{self.host}" successfully')
 
     def mount(self, sub_folder: str = "Public") -> None:
@@ -278,6 +1046,14 @@ class Mount:
         else:
             raise RuntimeError("No available drive letters")
 
+    def _pscp(self, options: str, source: str, destination: str, check: bool = True) -> str:
+        """Run pscp with the password, masked in telemetry and error messages."""
+
+        def command(password: str) -> str:
+            return f'"pscp.exe" {options} -ssh -pw "{password}" {source} {destination}'
+
+        return Subproc.run(command(self.password), check=check, display=command(REDACTED))
+
     def scp(
         self,
         local_file: str,
@@ -297,22 +1073,22 @@ class Mount:
 
         if copy_to_remote:
             # get the hostkey if it is the first time to connect to the server
-            ret = Subproc.run(f'"pscp.exe" -batch -ssh -pw "{self.password}" "{local_file}" "{self.username}"@"{self.host}":"{remote_file}"', check=False)
+            ret = self._pscp("-batch", f'"{local_file}"', f'"{self.username}"@"{self.host}":"{remote_file}"', check=False)
             hostkey = re.findall(r"ssh-[\w]+ \d+ SHA256:[A-Za-z0-9+/=]+", ret)
             if hostkey:
                 hostkey = hostkey[0]
                 # subproc.run failed if the hostkey is not found in registry (regedit) and path HKEY_CURRENT_USER\Software\SimonTatham\PuTTY\SshHostKeys
-                Subproc.run(f'"pscp.exe" -hostkey "{hostkey}" -ssh -pw "{self.password}" "{local_file}" "{self.username}"@"{self.host}":"{remote_file}"')
+                self._pscp(f'-hostkey "{hostkey}"', f'"{local_file}"', f'"{self.username}"@"{self.host}":"{remote_file}"')
             Subproc.run(rf'dir "{self.free_letter}:\{filename}"', shell=True)
             pt(f"SCP {local_file} {self.username}@{self.host}:{remote_file} successfully")
         else:
             # get the hostkey if it is the first time to connect to the server
-            ret = Subproc.run(f'"pscp.exe" -batch -ssh -pw "{self.password}" "{self.username}"@"{self.host}":"{remote_file}" "{local_file}"', check=False)
+            ret = self._pscp("-batch", f'"{self.username}"@"{self.host}":"{remote_file}"', f'"{local_file}"', check=False)
             hostkey = re.findall(r"ssh-[\w]+ \d+ SHA256:[A-Za-z0-9+/=]+", ret)
             if hostkey:
                 hostkey = hostkey[0]
                 # subproc.run failed if the hostkey is not found in registry (regedit) and path HKEY_CURRENT_USER\Software\SimonTatham\PuTTY\SshHostKeys
-                Subproc.run(f'"pscp.exe" -hostkey "{hostkey}" -ssh -pw "{self.password}" "{self.username}"@"{self.host}":"{remote_file}" "{local_file}"')
+                self._pscp(f'-hostkey "{hostkey}"', f'"{self.username}"@"{self.host}":"{remote_file}"', f'"{local_file}"')
             Subproc.run(rf'dir "{local_file}\{filename}"', shell=True)
             pt(f"SCP {self.username}@{self.host}:{remote_file} {local_file} successfully")
 